@@ -25,4 +25,16 @@ app.conf.beat_schedule = {
             hour=23, minute=55
         ),  # Executes daily at 5 mins before midnight in UTC
     },
+    "refresh-recipe-trending-scores": {
+        "task": "recipe.tasks.refresh_trending_scores",
+        "schedule": crontab(minute="*/10"),  # Executes every 10 minutes
+    },
+    "flush-recipe-like-buffer": {
+        "task": "recipe.tasks.flush_like_buffer",
+        "schedule": 5.0,  # Executes every 5 seconds, a no-op unless enabled
+    },
+    "rollup-recipe-likes": {
+        "task": "recipe.tasks.rollup_recipe_likes",
+        "schedule": crontab(minute="*/5"),  # Executes every 5 minutes
+    },
 }
@@ -23,6 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third-party apps
     'rest_framework',
@@ -137,12 +138,13 @@ CORS_ORIGIN_ALLOW_ALL = True
 
 
 # Email config
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_USE_TLS = True
-EMAIL_PORT = 587
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
+EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
 EMAIL_HOST_USER = config('EMAIL_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_PASSWORD')
+EMAIL_TIMEOUT = 30  # in seconds
 
 
 REST_FRAMEWORK = {
@@ -258,3 +260,80 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
 # settings.py
+
+# Cache configuration (Redis, shared by all web workers)
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': config('REDIS_CACHE_URL', default=config('REDIS_URL')),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SOCKET_CONNECT_TIMEOUT': 1,
+            'SOCKET_TIMEOUT': 1,
+            # A cache outage degrades to database reads instead of errors
+            'IGNORE_EXCEPTIONS': True,
+        },
+    }
+}
+DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS = True
+
+# Recipe read cache
+RECIPE_CACHE_ENABLED = config('RECIPE_CACHE_ENABLED', default=True, cast=bool)
+RECIPE_CACHE_ALIAS = 'default'
+RECIPE_CACHE_TIMEOUT = config('RECIPE_CACHE_TIMEOUT', default=300, cast=int)  # in seconds
+
+# Reference data cache (category names, usernames): an in-process LRU in
+# front of the shared cache
+REFERENCE_CACHE_ALIAS = 'default'
+REFERENCE_CACHE_LOCAL_MAXSIZE = 10000
+REFERENCE_CACHE_LOCAL_TTL = 30  # in seconds
+REFERENCE_CACHE_TIMEOUT = 60 * 60  # in seconds
+
+# Bulk recipe import
+RECIPE_IMPORT_BATCH_SIZE = 1000
+
+# Recipe NDJSON export, rows fetched per server-side cursor round trip
+RECIPE_EXPORT_CHUNK_SIZE = 2000
+
+# Trending recipes: likes and bookmarks lose half their weight every
+# half-life and stop counting after the window
+RECIPE_TRENDING_HALF_LIFE = 24 * 60 * 60  # in seconds
+RECIPE_TRENDING_WINDOW = 7 * 24 * 60 * 60  # in seconds
+RECIPE_TRENDING_BOOKMARK_WEIGHT = 2.0
+
+# "Cook with what I have" search (/api/recipe/cook/?ingredients=)
+RECIPE_COOK_MAX_INGREDIENTS = 30
+
+# Recipe multi-get (/api/recipe/batch/?ids=)
+RECIPE_BATCH_MAX_IDS = 100
+
+# Bulk bookmark add/remove (/api/user/profile/<id>/bookmarks/ with ids)
+BOOKMARK_BULK_MAX_IDS = 100
+
+# Write-behind likes: like/unlike only record intents in Redis and
+# recipe.tasks.flush_like_buffer writes them to the database in batches
+RECIPE_LIKE_BUFFER_ENABLED = config('RECIPE_LIKE_BUFFER_ENABLED', default=False, cast=bool)
+RECIPE_LIKE_BUFFER_ALIAS = 'default'
+RECIPE_LIKE_BUFFER_PREFIX = 'likes:buffer:'
+RECIPE_LIKE_BUFFER_BATCH_SIZE = 5000  # intents written per statement
+RECIPE_LIKE_BUFFER_LOCK_TIMEOUT = 60  # in seconds
+
+# Author like analytics: like events are rolled up into daily totals by
+# recipe.tasks.rollup_recipe_likes
+RECIPE_LIKE_ROLLUP_BATCH_SIZE = 10000  # events consumed per statement
+RECIPE_ANALYTICS_MAX_DAYS = 366
+RECIPE_ANALYTICS_DEFAULT_DAYS = 30
+
+# Bulk user provisioning: rows per insert, and processes hashing passwords
+# in the import_users command (0 for one per CPU)
+USER_IMPORT_BATCH_SIZE = 1000
+USER_IMPORT_HASH_WORKERS = config('USER_IMPORT_HASH_WORKERS', default=0, cast=int)
+
+# Daily likes digest: authors handled per send_daily_likes_digest subtask
+DAILY_LIKES_DIGEST_CHUNK_SIZE = 500
+
+# Email delivery (users.delivery): messages sent per SMTP connection, and
+# retries of transient failures with exponential backoff
+EMAIL_DELIVERY_BATCH_SIZE = 100
+EMAIL_DELIVERY_MAX_RETRIES = 3
+EMAIL_DELIVERY_RETRY_BACKOFF = 1  # in seconds, doubled on every retry
@@ -0,0 +1,212 @@
+"""
+Response cache for anonymous recipe reads.
+
+Entries are never deleted on writes. Instead every key embeds version
+counters that writes bump, so stale entries simply stop being addressed
+and expire on their own:
+
+- the global version covers data shared by every payload (categories),
+- the list version covers every list page,
+- the per-recipe version covers a single recipe detail and every multi-get
+  response that includes it.
+
+Usernames and category names in payloads come from the reference cache,
+whose in-process tier other processes only drop when its TTL expires. After
+a rename, responses are therefore not cached for REFERENCE_CACHE_LOCAL_TTL,
+so no process stores a payload with the old name under the new versions.
+"""
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_VERSION_KEY = 'recipe:version:global'
+LIST_VERSION_KEY = 'recipe:version:list'
+RECIPE_VERSION_KEY = 'recipe:version:detail:{}'
+SETTLING_KEY = 'recipe:version:settling'
+HITS_KEY = 'recipe:stats:hits'
+MISSES_KEY = 'recipe:stats:misses'
+
+
+def get_cache():
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def is_enabled():
+    return settings.RECIPE_CACHE_ENABLED
+
+
+def _get_versions(*keys):
+    """
+    Returns the current value of each version key, initializing missing
+    ones. Versions start from the current time so a key that was evicted
+    never restarts at a number that older entries were stored under.
+    Returns None for every key while reference data is settling.
+    """
+    cache = get_cache()
+    versions = cache.get_many([*keys, SETTLING_KEY]) or {}
+    if SETTLING_KEY in versions:
+        return [None] * len(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = int(time.time() * 1000)
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        versions.update(cache.get_many(missing) or {})
+    return [versions.get(key) for key in keys]
+
+
+def _bump_versions(*keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Not initialized yet: nothing can be cached under it.
+            pass
+
+
+def _invalidate(*keys):
+    # Bump now so readers stop using old entries, and again after commit so
+    # a page cached from pre-commit data in between is dropped as well.
+    if not is_enabled():
+        return
+    _bump_versions(*keys)
+    transaction.on_commit(lambda: _bump_versions(*keys))
+
+
+def invalidate_recipe(recipe_id):
+    """
+    Invalidates the detail of one recipe and every list page.
+    """
+    _invalidate(LIST_VERSION_KEY, RECIPE_VERSION_KEY.format(recipe_id))
+
+
+def invalidate_recipes(recipe_ids):
+    """
+    Invalidates the details of the given recipes and every list page.
+    """
+    _invalidate(LIST_VERSION_KEY,
+                *(RECIPE_VERSION_KEY.format(recipe_id) for recipe_id in recipe_ids))
+
+
+def invalidate_lists():
+    """
+    Invalidates every list page, e.g. after recipes were bulk inserted.
+    """
+    _invalidate(LIST_VERSION_KEY)
+
+
+def invalidate_all():
+    """
+    Invalidates every cached list page and detail.
+    """
+    _invalidate(GLOBAL_VERSION_KEY)
+
+
+def _settle():
+    get_cache().set(SETTLING_KEY, 1, timeout=settings.REFERENCE_CACHE_LOCAL_TTL)
+
+
+def invalidate_names():
+    """
+    Invalidates every cached list page and detail after a username or
+    category name changed, and stops caching responses until every process
+    dropped its local copy of the old name.
+    """
+    if not is_enabled():
+        return
+    invalidate_all()
+    _settle()
+    transaction.on_commit(_settle)
+
+
+def _params_digest(request):
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    )
+    raw = repr((request.get_host(), request.path, params))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def list_key(request):
+    """
+    Returns the cache key of a list page, or None if versions are unavailable.
+    """
+    versions = _get_versions(GLOBAL_VERSION_KEY, LIST_VERSION_KEY)
+    if None in versions:
+        return None
+    return 'recipe:response:list:{}:{}:{}'.format(*versions, _params_digest(request))
+
+
+def detail_key(request, recipe_id):
+    """
+    Returns the cache key of a recipe detail, or None if versions are
+    unavailable.
+    """
+    versions = _get_versions(
+        GLOBAL_VERSION_KEY, RECIPE_VERSION_KEY.format(recipe_id))
+    if None in versions:
+        return None
+    return 'recipe:response:detail:{}:{}:{}:{}'.format(
+        recipe_id, *versions, _params_digest(request))
+
+
+def batch_key(request, recipe_ids):
+    """
+    Returns the cache key of a multi-get response, or None if versions are
+    unavailable. The key changes whenever any of the requested recipes does.
+    """
+    versions = _get_versions(
+        GLOBAL_VERSION_KEY,
+        *(RECIPE_VERSION_KEY.format(recipe_id) for recipe_id in recipe_ids))
+    if None in versions:
+        return None
+    versions_digest = hashlib.md5(repr(versions).encode()).hexdigest()
+    return 'recipe:response:batch:{}:{}'.format(
+        versions_digest, _params_digest(request))
+
+
+def get_response(key):
+    data = get_cache().get(key)
+    _record(HITS_KEY if data is not None else MISSES_KEY)
+    return data
+
+
+def set_response(key, data):
+    get_cache().set(key, data, timeout=settings.RECIPE_CACHE_TIMEOUT)
+
+
+def _record(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_stats():
+    """
+    Returns hit/miss counters and the hit ratio of the recipe cache.
+    """
+    counters = get_cache().get_many([HITS_KEY, MISSES_KEY]) or {}
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -1,4 +1,5 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
 from .models import Recipe
 
 
@@ -9,7 +10,61 @@ class RecipeFilter(filters.FilterSet):
     author_username = filters.CharFilter(
         field_name="author__username", lookup_expr="icontains"
     )
+    category_name_exact = filters.CharFilter(
+        field_name="category__name", lookup_expr="iexact"
+    )
+    author_username_exact = filters.CharFilter(
+        field_name="author__username", lookup_expr="iexact"
+    )
+    category_id = filters.NumberFilter(field_name="category_id")
+    author_id = filters.NumberFilter(field_name="author_id")
+    cook_time_min = filters.TimeFilter(field_name="cook_time", lookup_expr="gte")
+    cook_time_max = filters.TimeFilter(field_name="cook_time", lookup_expr="lte")
+    created_after = filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="gte"
+    )
+    created_before = filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="lt"
+    )
 
     class Meta:
         model = Recipe
-        fields = ["category_name", "author_username"]
+        fields = [
+            "category_name",
+            "author_username",
+            "category_name_exact",
+            "author_username_exact",
+            "category_id",
+            "author_id",
+            "cook_time_min",
+            "cook_time_max",
+            "created_after",
+            "created_before",
+        ]
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """
+    `?ordering=likes|bookmarks|cook_time|created`, prefixed with `-` for
+    descending. A single key is accepted and the id follows in the same
+    direction, so every ordering is stable and matches a (field, id) index.
+    """
+
+    ordering_aliases = {
+        "likes": "likes_count",
+        "bookmarks": "bookmarks_count",
+        "cook_time": "cook_time",
+        "created": "created_at",
+    }
+
+    def get_ordering(self, request, queryset, view):
+        param = request.query_params.get(self.ordering_param, "")
+        param = param.split(",")[0].strip()
+        field = self.ordering_aliases.get(param.lstrip("-"))
+        if field is None:
+            return self.get_default_ordering(view)
+        prefix = "-" if param.startswith("-") else ""
+        return (prefix + field, prefix + "id")
+
+    def get_valid_fields(self, queryset, view, context={}):
+        return [(alias, alias) for alias in self.ordering_aliases]
@@ -0,0 +1,213 @@
+"""
+Bulk recipe import from JSON arrays or newline-delimited JSON.
+
+Input is read incrementally, validated and inserted in batches, so memory
+use depends on the batch size rather than on the size of the input.
+"""
+import codecs
+import itertools
+import json
+import logging
+
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+
+from . import cache as recipe_cache
+from . import refcache
+from .ingredients import index_recipes
+from .models import Recipe, RecipeCategory
+from .serializers import RecipeCategorySerializer
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+
+
+class RecipeImportSerializer(serializers.ModelSerializer):
+    """
+    Validates one imported recipe. Accepts the same payload as the create
+    endpoint, with `picture` given as an already stored file name.
+    """
+    category = RecipeCategorySerializer()
+    picture = serializers.CharField(required=False, allow_blank=True, max_length=100)
+
+    class Meta:
+        model = Recipe
+        fields = ('category', 'picture', 'title', 'desc', 'cook_time',
+                  'ingredients', 'procedure')
+
+
+def _iter_text(stream):
+    # Accepts binary streams (request bodies, files opened in 'rb') and text
+    # streams alike.
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            break
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def _iter_ndjson(chunks, head):
+    row = 0
+    buffer = ''
+    for chunk in itertools.chain([head], chunks):
+        *lines, buffer = (buffer + chunk).split('\n')
+        for line in lines:
+            if line.strip():
+                row += 1
+                yield (row, *_loads(line))
+    if buffer.strip():
+        yield (row + 1, *_loads(buffer))
+
+
+def _loads(line):
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, f'Invalid JSON: {e}'
+
+
+def _iter_json_array(chunks, buffer):
+    decoder = json.JSONDecoder()
+    row = 0
+    position = buffer.index('[') + 1
+    exhausted = False
+    while True:
+        # Skip separators between array items
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if exhausted:
+                raise ValueError(f'Invalid JSON array after item {row}')
+            chunk = next(chunks, None)
+            if chunk is None:
+                exhausted = True
+            else:
+                buffer = buffer[position:] + chunk
+                position = 0
+            continue
+        row += 1
+        yield row, value, None
+        buffer, position = buffer[end:], 0
+
+
+def iter_records(stream):
+    """
+    Yields (row, data, error) for each record of a JSON array or NDJSON
+    stream. Malformed NDJSON lines are reported through `error`; a malformed
+    JSON array raises ValueError since parsing cannot resume after it.
+    """
+    chunks = _iter_text(stream)
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        if buffer.strip():
+            break
+    if buffer.lstrip().startswith('['):
+        return _iter_json_array(chunks, buffer)
+    return _iter_ndjson(chunks, buffer)
+
+
+class RecipeImporter:
+    """
+    Imports recipes for one author in batches: rows are validated one by
+    one, categories are resolved once per batch and recipes are inserted
+    with `bulk_create`. Invalid rows are reported without stopping the
+    import.
+    """
+
+    def __init__(self, author, batch_size=1000, max_errors=1000):
+        self.author = author
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'errors': errors})
+
+    def run(self, records):
+        batch = []
+        for row, data, error in records:
+            if error is not None:
+                self.add_error(row, {'non_field_errors': [error]})
+                continue
+            if not isinstance(data, dict):
+                self.add_error(row, {'non_field_errors': ['Expected a JSON object.']})
+                continue
+            batch.append((row, data))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+        if self.created:
+            recipe_cache.invalidate_lists()
+        return self.get_result()
+
+    def import_batch(self, batch):
+        valid = []
+        for row, data in batch:
+            serializer = RecipeImportSerializer(data=data)
+            if serializer.is_valid():
+                valid.append((row, serializer.validated_data))
+            else:
+                self.add_error(row, serializer.errors)
+        if not valid:
+            return
+
+        categories = self.resolve_categories(
+            {data['category']['name'] for _, data in valid})
+        recipes = [
+            Recipe(
+                author=self.author,
+                category=categories[data['category']['name']],
+                **{key: value for key, value in data.items() if key != 'category'},
+            )
+            for _, data in valid
+        ]
+        try:
+            with transaction.atomic():
+                Recipe.objects.bulk_create(recipes, batch_size=self.batch_size)
+                # bulk_create sends no post_save, index ingredients here
+                index_recipes(recipes, created=True)
+        except DatabaseError as e:
+            logger.error(f'Error import recipes batch: {e}', exc_info=True)
+            for row, _ in valid:
+                self.add_error(row, {'non_field_errors': [str(e)]})
+            return
+        self.created += len(recipes)
+
+    def resolve_categories(self, names):
+        """
+        Returns {name: category} for the given names from the reference
+        cache, creating missing categories in one query. Like get_or_create,
+        the first existing category with a name wins.
+        """
+        categories = {
+            name: RecipeCategory.from_db('default', ['id', 'name'], [category_id, name])
+            for name, category_id in refcache.category_ids.get_many(names).items()
+        }
+        missing = [RecipeCategory(name=name) for name in names - categories.keys()]
+        for category in RecipeCategory.objects.bulk_create(missing):
+            categories[category.name] = category
+            refcache.category_ids.set(category.name, category.id)
+        return categories
+
+    def get_result(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+        }
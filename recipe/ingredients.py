@@ -0,0 +1,110 @@
+"""
+Ingredient parsing and the ingredient -> recipe inverted index.
+
+Free-text ingredient lists are split into items, stripped of quantities,
+units and notes, and normalized to singular lowercase names. Each recipe
+is linked to its ingredient names through RecipeIngredient, so recipes
+using a set of ingredients are found by intersecting posting lists
+instead of scanning ingredient text.
+"""
+import re
+
+from django.db import transaction
+
+from .models import Ingredient, Recipe, RecipeIngredient
+
+MAX_NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+
+UNITS = {
+    'bunch', 'can', 'clove', 'cup', 'dash', 'drop', 'g', 'gallon', 'gram',
+    'handful', 'kg', 'kilogram', 'l', 'lb', 'litre', 'liter', 'mg', 'ml',
+    'ounce', 'oz', 'package', 'pinch', 'pint', 'pound', 'quart', 'slice',
+    'stick', 'tablespoon', 'tbsp', 'teaspoon', 'tsp',
+}
+
+# Item separators: commas, semicolons, new lines and list bullets
+_SPLIT_RE = re.compile(r'[,;\n\r]+|\s[-*•]\s')
+_NOTE_RE = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+_QUANTITY_RE = re.compile(r'^[\d\s/.¼-¾⅐-⅞-]+')
+_WORD_RE = re.compile(r"[a-z][a-z'-]*")
+_STOP_WORDS = {'a', 'an', 'of', 'some', 'fresh', 'to', 'taste'}
+_UNCOUNTABLE = {'molasses', 'grits', 'oats'}
+
+
+def _singular(word):
+    if (len(word) <= 3 or word in _UNCOUNTABLE
+            or word.endswith(('ss', 'us', 'is'))):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(item):
+    """
+    Returns the normalized name of one ingredient item, e.g.
+    '2 cups Plain Flour (sifted)' -> 'plain flour', or '' if nothing is left.
+    """
+    item = _NOTE_RE.sub(' ', item.lower())
+    item = _QUANTITY_RE.sub('', item.strip())
+    words = _WORD_RE.findall(item)
+    while words and (_singular(words[0].rstrip('.')) in UNITS
+                     or words[0] in _STOP_WORDS):
+        words.pop(0)
+    words = [_singular(word) for word in words if word not in _STOP_WORDS]
+    return ' '.join(words)[:MAX_NAME_LENGTH]
+
+
+def parse_ingredients(text):
+    """
+    Returns the sorted distinct ingredient names of a free-text list.
+    """
+    names = {normalize_ingredient(item) for item in _SPLIT_RE.split(text or '')}
+    names.discard('')
+    return sorted(names)
+
+
+def get_ingredient_ids(names):
+    """
+    Returns {name: id} for the given names, creating missing ingredients.
+    """
+    ids = dict(Ingredient.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = [Ingredient(name=name) for name in names if name not in ids]
+    if missing:
+        Ingredient.objects.bulk_create(missing, ignore_conflicts=True)
+        ids.update(
+            Ingredient.objects.filter(name__in=[i.name for i in missing])
+            .values_list('name', 'id'))
+    return ids
+
+
+def index_recipes(recipes, created=False):
+    """
+    Rebuilds the ingredient links and ingredient_count of the given
+    recipes, in a constant number of queries per call. Pass `created` for
+    new recipes, which have no links to remove.
+    """
+    parsed = {recipe.id: parse_ingredients(recipe.ingredients) for recipe in recipes}
+    if not parsed:
+        return
+    ids = get_ingredient_ids({name for names in parsed.values() for name in names})
+    links = [
+        RecipeIngredient(recipe_id=recipe_id, ingredient_id=ids[name])
+        for recipe_id, names in parsed.items()
+        for name in names
+    ]
+    for recipe in recipes:
+        recipe.ingredient_count = len(parsed[recipe.id])
+    counts = [
+        Recipe(id=recipe_id, ingredient_count=len(names))
+        for recipe_id, names in parsed.items()
+    ]
+    with transaction.atomic(savepoint=False):
+        if not created:
+            RecipeIngredient.objects.filter(recipe_id__in=parsed).delete()
+        RecipeIngredient.objects.bulk_create(links)
+        Recipe.objects.bulk_update(counts, ['ingredient_count'])
@@ -0,0 +1,311 @@
+"""
+Write-behind buffering of recipe likes in Redis.
+
+When RECIPE_LIKE_BUFFER_ENABLED is set, like and unlike requests only
+record the user's intent in Redis and the flush_like_buffer Celery task
+writes them to RecipeLike in bulk. Per recipe the buffer keeps:
+
+- pending: a hash of user id -> '1' (like) or '0' (unlike), the latest
+  intent of every user since the last flush,
+- pending delta: the net change of the like count those intents make,
+- dirty: the set of recipes with pending intents.
+
+A flush renames pending to flushing, applies flushing to the database and
+then deletes it. Applying is idempotent (inserts skip existing likes,
+counters move by the rows actually changed), so a flush interrupted at any
+point is simply completed by the next one. Reads add the pending and
+flushing deltas to the stored likes_count.
+
+Redis must persist its data (AOF) for buffered likes to survive a Redis
+restart; worker restarts are safe either way.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from . import cache as recipe_cache
+from .models import Recipe, RecipeLike, RecipeLikeEvent
+
+logger = logging.getLogger(__name__)
+
+# KEYS: pending, pending delta, flushing, dirty
+# ARGV: user id, intent, persisted state, recipe id
+RECORD_SCRIPT = '''
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if not current then current = redis.call('HGET', KEYS[3], ARGV[1]) end
+if not current then current = ARGV[3] end
+if current == ARGV[2] then return 0 end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('INCRBY', KEYS[2], ARGV[2] == '1' and 1 or -1)
+redis.call('SADD', KEYS[4], ARGV[4])
+return 1
+'''
+
+# KEYS: pending, pending delta, flushing, flushing delta, dirty
+# ARGV: recipe id
+CLAIM_SCRIPT = '''
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        redis.call('SREM', KEYS[5], ARGV[1])
+        return {}
+    end
+    redis.call('RENAME', KEYS[1], KEYS[3])
+    if redis.call('EXISTS', KEYS[2]) == 1 then
+        redis.call('RENAME', KEYS[2], KEYS[4])
+    end
+end
+return redis.call('HGETALL', KEYS[3])
+'''
+
+# KEYS: pending, flushing, flushing delta, dirty
+# ARGV: recipe id
+ACK_SCRIPT = '''
+redis.call('DEL', KEYS[2], KEYS[3])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('SREM', KEYS[4], ARGV[1])
+end
+return 1
+'''
+
+APPLY_SQL = '''
+    WITH intents (user_id, recipe_id, liked) AS (
+        SELECT * FROM UNNEST(%(users)s::bigint[], %(recipes)s::bigint[],
+                             %(liked)s::boolean[])
+    ), inserted AS (
+        INSERT INTO {like_table} (user_id, recipe_id, created)
+        SELECT intents.user_id, intents.recipe_id, NOW()
+        FROM intents
+        JOIN {recipe_table} recipe ON recipe.id = intents.recipe_id
+        JOIN {user_table} author ON author.id = intents.user_id
+        WHERE intents.liked
+        ON CONFLICT (user_id, recipe_id) DO NOTHING
+        RETURNING recipe_id
+    ), deleted AS (
+        DELETE FROM {like_table} liked
+        USING intents
+        WHERE NOT intents.liked
+          AND liked.user_id = intents.user_id
+          AND liked.recipe_id = intents.recipe_id
+        RETURNING liked.recipe_id
+    ), logged AS (
+        INSERT INTO {event_table} (recipe_id, liked, created)
+        SELECT recipe_id, TRUE, NOW() FROM inserted
+        UNION ALL
+        SELECT recipe_id, FALSE, NOW() FROM deleted
+    ), changes AS (
+        SELECT recipe_id, SUM(change) AS change FROM (
+            SELECT recipe_id, 1 AS change FROM inserted
+            UNION ALL
+            SELECT recipe_id, -1 AS change FROM deleted
+        ) all_changes
+        GROUP BY recipe_id
+    )
+    UPDATE {recipe_table}
+    SET likes_count = GREATEST(likes_count + changes.change, 0),
+        updated_at = NOW()
+    FROM changes
+    WHERE {recipe_table}.id = changes.recipe_id
+    RETURNING {recipe_table}.id
+'''
+
+
+def is_enabled():
+    return settings.RECIPE_LIKE_BUFFER_ENABLED
+
+
+def get_client():
+    return get_redis_connection(settings.RECIPE_LIKE_BUFFER_ALIAS)
+
+
+def _key(name, recipe_id=None):
+    prefix = settings.RECIPE_LIKE_BUFFER_PREFIX
+    if recipe_id is None:
+        return f'{prefix}{name}'
+    return f'{prefix}recipe:{recipe_id}:{name}'
+
+
+def _keys(recipe_id):
+    return {
+        'pending': _key('pending', recipe_id),
+        'pending_delta': _key('pending_delta', recipe_id),
+        'flushing': _key('flushing', recipe_id),
+        'flushing_delta': _key('flushing_delta', recipe_id),
+        'dirty': _key('dirty'),
+    }
+
+
+def like(user_id, recipe_id):
+    """
+    Buffers a like, returns (recipe_exists, created) like
+    RecipeLike.objects.like.
+    """
+    return _record(user_id, recipe_id, True)
+
+
+def unlike(user_id, recipe_id):
+    """
+    Buffers an unlike, returns (recipe_exists, removed) like
+    RecipeLike.objects.unlike.
+    """
+    return _record(user_id, recipe_id, False)
+
+
+def _record(user_id, recipe_id, liked):
+    # One query reads whether the recipe exists and the persisted like, the
+    # script then compares the intent with the latest buffered or persisted
+    # state so repeated likes stay idempotent.
+    persisted = (
+        Recipe.objects.filter(id=recipe_id)
+        .annotate(liked=Exists(RecipeLike.objects.filter(
+            recipe=OuterRef('pk'), user_id=user_id)))
+        .values_list('liked', flat=True)
+        .first()
+    )
+    if persisted is None:
+        return False, False
+    keys = _keys(recipe_id)
+    changed = get_client().eval(
+        RECORD_SCRIPT, 4,
+        keys['pending'], keys['pending_delta'], keys['flushing'], keys['dirty'],
+        user_id, '1' if liked else '0', '1' if persisted else '0', recipe_id)
+    return True, bool(changed)
+
+
+def get_deltas(recipe_ids):
+    """
+    Returns {recipe_id: like count change not yet flushed} for the given
+    recipes, leaving out recipes without one.
+    """
+    recipe_ids = list(recipe_ids)
+    if not is_enabled() or not recipe_ids:
+        return {}
+    keys = []
+    for recipe_id in recipe_ids:
+        keys += [_key('pending_delta', recipe_id), _key('flushing_delta', recipe_id)]
+    try:
+        values = get_client().mget(keys)
+    except RedisError as e:
+        logger.warning(f'Like buffer unavailable, reading stored counts: {e}')
+        return {}
+    deltas = {}
+    for i, recipe_id in enumerate(recipe_ids):
+        delta = int(values[2 * i] or 0) + int(values[2 * i + 1] or 0)
+        if delta:
+            deltas[recipe_id] = delta
+    return deltas
+
+
+def get_user_likes(user_id, recipe_ids):
+    """
+    Returns {recipe_id: liked} for the given recipes the user liked or
+    unliked since the last flush.
+    """
+    if not is_enabled() or user_id is None or not recipe_ids:
+        return {}
+    try:
+        pipeline = get_client().pipeline(transaction=False)
+        for recipe_id in recipe_ids:
+            pipeline.hget(_key('pending', recipe_id), user_id)
+            pipeline.hget(_key('flushing', recipe_id), user_id)
+        values = pipeline.execute()
+    except RedisError as e:
+        logger.warning(f'Like buffer unavailable, reading stored likes: {e}')
+        return {}
+    likes = {}
+    for i, recipe_id in enumerate(recipe_ids):
+        intent = values[2 * i] or values[2 * i + 1]
+        if intent is not None:
+            likes[recipe_id] = intent == b'1'
+    return likes
+
+
+def _claim(client, recipe_id):
+    keys = _keys(recipe_id)
+    intents = client.eval(
+        CLAIM_SCRIPT, 5,
+        keys['pending'], keys['pending_delta'], keys['flushing'],
+        keys['flushing_delta'], keys['dirty'], recipe_id)
+    # HGETALL as a flat [user, intent, user, intent, ...] list
+    return {int(user): intent == b'1'
+            for user, intent in zip(intents[::2], intents[1::2])}
+
+
+def _ack(client, recipe_id):
+    keys = _keys(recipe_id)
+    client.eval(
+        ACK_SCRIPT, 4,
+        keys['pending'], keys['flushing'], keys['flushing_delta'], keys['dirty'],
+        recipe_id)
+
+
+def apply(intents):
+    """
+    Writes {(user_id, recipe_id): liked} to RecipeLike and the recipes'
+    likes_count in one statement. Returns the ids of the recipes changed.
+    """
+    if not intents:
+        return []
+    sql = APPLY_SQL.format(
+        like_table=RecipeLike._meta.db_table,
+        event_table=RecipeLikeEvent._meta.db_table,
+        recipe_table=Recipe._meta.db_table,
+        user_table=get_user_model()._meta.db_table,
+    )
+    params = {
+        'users': [user_id for user_id, _ in intents],
+        'recipes': [recipe_id for _, recipe_id in intents],
+        'liked': list(intents.values()),
+    }
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def flush(batch_size=None):
+    """
+    Moves buffered likes to the database in batches of about `batch_size`
+    intents. Returns the number of intents flushed.
+    """
+    batch_size = batch_size or settings.RECIPE_LIKE_BUFFER_BATCH_SIZE
+    client = get_client()
+    # Claims of one recipe must not be acknowledged by a concurrent flush
+    lock = client.lock(_key('flush_lock'),
+                       timeout=settings.RECIPE_LIKE_BUFFER_LOCK_TIMEOUT,
+                       blocking_timeout=0)
+    if not lock.acquire():
+        logger.debug('Like buffer flush already running')
+        return 0
+    flushed = 0
+    try:
+        dirty = client.sscan_iter(_key('dirty'), count=batch_size)
+        recipe_ids = sorted({int(recipe_id) for recipe_id in dirty})
+        while recipe_ids:
+            claimed, intents = [], {}
+            while recipe_ids and len(intents) < batch_size:
+                recipe_id = recipe_ids.pop()
+                claimed.append(recipe_id)
+                for user_id, liked in _claim(client, recipe_id).items():
+                    intents[(user_id, recipe_id)] = liked
+            changed = apply(intents)
+            for recipe_id in claimed:
+                _ack(client, recipe_id)
+            for recipe_id in changed:
+                recipe_cache.invalidate_recipe(recipe_id)
+            flushed += len(intents)
+            logger.debug(f'Flushed {len(intents)} buffered likes of '
+                         f'{len(claimed)} recipes')
+    finally:
+        lock.release()
+    return flushed
+
+
+def get_stats():
+    """
+    Returns the number of recipes with buffered likes.
+    """
+    return {'dirty_recipes': get_client().scard(_key('dirty'))}
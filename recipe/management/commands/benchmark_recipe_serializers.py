@@ -0,0 +1,87 @@
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from recipe.models import Recipe, RecipeCategory
+from recipe.serializers import RecipeReadSerializer, RecipeSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Compare RecipeSerializer with RecipeReadSerializer on list '
+            'payloads. Sample recipes are rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+            help='Numbers of recipes to serialize.')
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Timed runs per measurement; the fastest is reported.')
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().get('/api/recipe/', HTTP_HOST='localhost')
+        context = {'request': request}
+        fields = RecipeSerializer.Meta.fields
+
+        with transaction.atomic():
+            author = User.objects.create_user(
+                email='benchmark@example.com', password=None,
+                username='benchmark')
+            category = RecipeCategory.objects.create(name='Benchmark')
+            created = 0
+            self.stdout.write(
+                f"{'rows':>7} {'serializer':<22} {'time (ms)':>10} "
+                f"{'peak (KiB)':>11}")
+            for size in sorted(options['sizes']):
+                Recipe.objects.bulk_create(
+                    [self.build_recipe(author, category, i)
+                     for i in range(created, size)],
+                    batch_size=1000)
+                created = max(created, size)
+                queryset = Recipe.objects.filter(author=author)[:size]
+
+                def model_serializer():
+                    return RecipeSerializer(
+                        queryset.with_related(), many=True,
+                        context=context).data
+
+                def read_serializer():
+                    reader = RecipeReadSerializer(fields, context)
+                    return reader.serialize(
+                        queryset.values(*reader.get_value_fields()))
+
+                for name, func in (('RecipeSerializer', model_serializer),
+                                   ('RecipeReadSerializer', read_serializer)):
+                    elapsed, peak = self.measure(func, options['repeat'])
+                    self.stdout.write(
+                        f'{size:>7} {name:<22} {elapsed * 1000:>10.1f} '
+                        f'{peak / 1024:>11.0f}')
+            transaction.set_rollback(True)
+
+    def build_recipe(self, author, category, i):
+        return Recipe(
+            author=author, category=category, picture=f'uploads/{i}.jpg',
+            title=f'Recipe {i}', desc='Benchmark recipe',
+            cook_time='00:30:00', ingredients='Flour, Sugar, Eggs ' * 20,
+            procedure='Mix everything and bake. ' * 40)
+
+    def measure(self, func, repeat):
+        # Time and memory are measured in separate runs because tracing
+        # allocations slows the code down.
+        best_time = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best_time = elapsed if best_time is None else min(best_time, elapsed)
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return best_time, peak
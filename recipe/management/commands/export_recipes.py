@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from recipe.exporters import RecipeExporter, parse_since
+from recipe.filter import RecipeFilter
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Stream every recipe as NDJSON, optionally filtered like the recipe list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='File to write, or - (default) to write to stdout.')
+        parser.add_argument(
+            '--filter', action='append', default=[], metavar='NAME=VALUE',
+            help='Recipe list filter, e.g. --filter category_name=dessert. '
+                 'May be repeated.')
+        parser.add_argument(
+            '--since', help='Only export recipes updated at or after this '
+                            'ISO 8601 datetime.')
+        parser.add_argument(
+            '--since-id', type=int,
+            help='With --since, skip recipes updated exactly at --since with '
+                 'an id up to this one.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.RECIPE_EXPORT_CHUNK_SIZE,
+            help='Rows fetched per database round trip.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be a positive integer')
+        params = QueryDict(mutable=True)
+        for value in options['filter']:
+            name, sep, value = value.partition('=')
+            if not sep:
+                raise CommandError(f'Invalid filter {name!r}, expected NAME=VALUE')
+            params.appendlist(name, value)
+        filterset = RecipeFilter(params, queryset=Recipe.objects.all())
+        if not filterset.is_valid():
+            raise CommandError(f'Invalid filters: {dict(filterset.errors)}')
+        try:
+            since = parse_since(options['since']) if options['since'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        exporter = RecipeExporter(
+            filterset.qs,
+            since=since,
+            since_id=options['since_id'],
+            chunk_size=options['chunk_size'],
+        )
+        if options['path'] == '-':
+            output = self.stdout
+        else:
+            output = open(options['path'], 'w', encoding='utf-8')
+        count = 0
+        try:
+            for line in exporter.iter_lines():
+                output.write(line)
+                count += 1
+        finally:
+            if output is not self.stdout:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(f'Exported {count} recipes.'))
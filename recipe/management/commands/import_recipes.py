@@ -0,0 +1,52 @@
+import json
+import sys
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importers import RecipeImporter, iter_records
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Bulk import recipes from a JSON array or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='File to import, or - to read from stdin.')
+        parser.add_argument(
+            '--author', required=True,
+            help='Email of the user the recipes are created for.')
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.RECIPE_IMPORT_BATCH_SIZE,
+            help='Number of rows validated and inserted per batch.')
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(email=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['author']} does not exist")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be a positive integer')
+
+        importer = RecipeImporter(author, batch_size=options['batch_size'])
+        if options['path'] == '-':
+            stream = sys.stdin.buffer
+        else:
+            stream = open(options['path'], 'rb')
+        try:
+            result = importer.run(iter_records(stream))
+        except ValueError as e:
+            raise CommandError(
+                f'{e} ({importer.created} recipes imported before the error)')
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        for error in result['errors']:
+            self.stderr.write(
+                f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} recipes, {result['failed']} failed."))
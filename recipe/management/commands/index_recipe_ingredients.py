@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from recipe.ingredients import index_recipes
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Parse recipe ingredient lists and rebuild the ingredient index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of recipes indexed per batch.')
+        parser.add_argument(
+            '--missing-only', action='store_true',
+            help='Only index recipes without indexed ingredients.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Recipe.objects.only('id', 'ingredients').order_by('id')
+        if options['missing_only']:
+            queryset = queryset.filter(ingredient_count=0)
+        last_id = 0
+        indexed = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            index_recipes(batch)
+            indexed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} recipes.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipe import cache as recipe_cache
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the recipe response cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Reset the counters after printing them.')
+
+    def handle(self, *args, **options):
+        stats = recipe_cache.get_stats()
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} "
+            f"hit_ratio={stats['hit_ratio']:.2%}")
+        if options['reset']:
+            recipe_cache.reset_stats()
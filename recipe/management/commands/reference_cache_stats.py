@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipe import refcache
+
+
+class Command(BaseCommand):
+    help = 'Show lookup counters of the reference data caches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Reset the counters after printing them.')
+
+    def handle(self, *args, **options):
+        for cache in refcache.reference_caches:
+            stats = cache.get_stats()
+            self.stdout.write(
+                f"{cache.name}: local_hits={stats['local_hits']} "
+                f"shared_hits={stats['shared_hits']} misses={stats['misses']} "
+                f"hit_ratio={stats['hit_ratio']:.2%}")
+            if options['reset']:
+                cache.reset_stats()
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipe import cache as recipe_cache
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored like and bookmark counters of recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of recipes checked per batch.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = repaired = 0
+        while True:
+            batch = list(
+                Recipe.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+            checked += len(batch)
+
+            drifted = list(
+                Recipe.objects.filter(id__in=batch)
+                .with_actual_counts()
+                .exclude(likes_count=F('actual_likes_count'),
+                         bookmarks_count=F('actual_bookmarks_count'))
+                .values_list('id', flat=True)
+            )
+            if drifted:
+                Recipe.objects.filter(id__in=drifted).sync_counters()
+                recipe_cache.invalidate_recipes(drifted)
+            repaired += len(drifted)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} recipes, repaired {repaired}.'))
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.9 on 2026-10-18 05:45
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('pg_catalog.english', coalesce({row}title, '')), 'A') ||
+    setweight(to_tsvector('pg_catalog.english', coalesce({row}"desc", '')), 'B') ||
+    setweight(to_tsvector('pg_catalog.english', coalesce({row}ingredients, '')), 'C')
+"""
+
+CREATE_TRIGGER_SQL = """
+CREATE FUNCTION recipe_recipe_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {vector};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER recipe_recipe_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, "desc", ingredients, search_vector
+ON recipe_recipe
+FOR EACH ROW EXECUTE FUNCTION recipe_recipe_search_vector_update();
+
+UPDATE recipe_recipe SET search_vector = {backfill};
+""".format(
+    vector=SEARCH_VECTOR_SQL.format(row='NEW.'),
+    backfill=SEARCH_VECTOR_SQL.format(row=''),
+)
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS recipe_recipe_search_vector_trigger ON recipe_recipe;
+DROP FUNCTION IF EXISTS recipe_recipe_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0005_recipe_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER_SQL, DROP_TRIGGER_SQL),
+    ]
@@ -0,0 +1,27 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0006_recipe_search_vector'),
+    ]
+
+    # RecipeFilter.category_name uses icontains, which Postgres runs as
+    # UPPER(name::text) LIKE UPPER(%s); the indexes match that expression.
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            """
+            CREATE INDEX recipe_category_name_trgm_idx
+            ON recipe_recipecategory USING gin (UPPER(name::text) gin_trgm_ops);
+            CREATE INDEX recipe_category_name_upper_idx
+            ON recipe_recipecategory (UPPER(name::text));
+            """,
+            """
+            DROP INDEX IF EXISTS recipe_category_name_trgm_idx;
+            DROP INDEX IF EXISTS recipe_category_name_upper_idx;
+            """,
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.9 on 2026-10-18 06:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0010_ingredient_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-likes_count', '-id'], name='recipe_likes_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-bookmarks_count', '-id'], name='recipe_bookmarks_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['cook_time', 'id'], name='recipe_cook_time_id_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+# Keep the oldest like of every (user, recipe) pair, then fix the counters
+# of recipes that had duplicates.
+DEDUPLICATE_LIKES = '''
+    WITH duplicates AS (
+        DELETE FROM recipe_recipelike newer
+        USING recipe_recipelike older
+        WHERE newer.user_id = older.user_id
+          AND newer.recipe_id = older.recipe_id
+          AND newer.id > older.id
+        RETURNING newer.recipe_id
+    )
+    UPDATE recipe_recipe
+    SET likes_count = GREATEST(likes_count - removed.total, 0)
+    FROM (
+        SELECT recipe_id, COUNT(*) AS total FROM duplicates GROUP BY recipe_id
+    ) removed
+    WHERE recipe_recipe.id = removed.recipe_id;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0011_recipe_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEDUPLICATE_LIKES, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='recipelike',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='recipelike_user_recipe_unique'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.9 on 2026-10-18 06:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# Seed the daily totals with the likes that exist today; unlikes before
+# this migration were not recorded.
+BACKFILL_DAILY_LIKES = '''
+    INSERT INTO recipe_recipelikedaily (author_id, recipe_id, day, likes, unlikes)
+    SELECT recipe.author_id, liked.recipe_id,
+           (liked.created AT TIME ZONE %s)::date, COUNT(*), 0
+    FROM recipe_recipelike liked
+    JOIN recipe_recipe recipe ON recipe.id = liked.recipe_id
+    GROUP BY 1, 2, 3;
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipe', '0012_recipelike_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeLikeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('liked', models.BooleanField()),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipe.recipe')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipeLikeDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('unlikes', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipe.recipe')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipelikedaily',
+            index=models.Index(fields=['author', 'day'], name='recipelikedaily_author_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipelikedaily',
+            constraint=models.UniqueConstraint(fields=('recipe', 'day'), name='recipelikedaily_recipe_day_unique'),
+        ),
+        migrations.RunSQL(
+            [(BACKFILL_DAILY_LIKES, [settings.TIME_ZONE])], migrations.RunSQL.noop),
+    ]
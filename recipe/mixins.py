@@ -0,0 +1,235 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import cache as recipe_cache
+from . import likebuffer
+from . import refcache
+from .serializers import RecipeReadSerializer
+
+
+class ConditionalReadMixin:
+    """
+    Adds ETags to recipe reads and serves anonymous reads from the recipe
+    cache.
+
+    The ETag is derived from (id, updated_at, likes_count, bookmarks_count)
+    of every served recipe, buffered likes, the author and category names
+    it shows, the page links and the representation requested. No
+    Last-Modified is sent: renames, buffered likes and recipes dropping out
+    of a page all change a response without touching updated_at.
+    Conditional requests are answered from the view's
+    `get_validator_objects`, a narrow query of the recipes the response
+    would contain that skips serialization, before the full read runs.
+    """
+    validator_fields = ('id', 'created_at', 'updated_at', 'likes_count',
+                        'bookmarks_count', 'author_id', 'category_id')
+
+    def get_object(self):
+        obj = super().get_object()
+        self.served_objects = [obj]
+        return obj
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        self.served_objects = page
+        self.served_page = True
+        return page
+
+    def get_etag(self, objects):
+        if not objects and not getattr(self, 'served_page', False):
+            return None
+        objects = [_as_dict(obj) for obj in objects]
+        # Buffered likes change the representation without touching updated_at
+        like_deltas = likebuffer.get_deltas(obj['id'] for obj in objects)
+        rows = [
+            (obj['id'], obj['updated_at'].isoformat(),
+             obj['likes_count'] + like_deltas.get(obj['id'], 0),
+             obj['bookmarks_count'])
+            for obj in objects
+        ]
+        page = ()
+        if getattr(self, 'served_page', False):
+            # Page-number pages expose the total count, cursor pages do not.
+            django_paginator = getattr(
+                getattr(self.paginator, 'page', None), 'paginator', None)
+            page = (
+                django_paginator.count if django_paginator else None,
+                self.paginator.get_next_link(),
+                self.paginator.get_previous_link(),
+            )
+        # Authenticated viewers get their own like/bookmark flags
+        representation = (
+            self.request.get_full_path(),
+            self.request.accepted_media_type,
+            self.request.user.id,
+        )
+        raw = repr((rows, self.get_validator_names(objects), page,
+                    representation)).encode()
+        return quote_etag(hashlib.md5(raw).hexdigest())
+
+    def get_validator_names(self, objects):
+        # Renaming a user or a category changes no recipe, so the names
+        # shown are part of the validators
+        fields = set(self.get_requested_fields()
+                     if hasattr(self, 'get_requested_fields') else ('username', 'category'))
+        usernames = categories = {}
+        if 'username' in fields:
+            usernames = refcache.usernames.get_many(
+                {obj['author_id'] for obj in objects})
+        if fields & {'category', 'category_name'}:
+            categories = refcache.category_names.get_many(
+                {obj['category_id'] for obj in objects})
+        return sorted(usernames.items()), sorted(categories.items())
+
+    def is_conditional_request(self):
+        return 'HTTP_IF_NONE_MATCH' in self.request.META
+
+    def get_read_response(self, get_key, view_func, *args, **kwargs):
+        """
+        Returns a 304 when the client copy is fresh, otherwise the cached or
+        freshly rendered response with validators attached.
+        """
+        key = None
+        if recipe_cache.is_enabled() and not self.request.user.is_authenticated:
+            key = get_key()
+        entry = recipe_cache.get_response(key) if key else None
+
+        if entry is not None:
+            etag = entry['etag']
+        elif self.is_conditional_request():
+            etag = self.get_etag(self.get_validator_objects())
+        else:
+            etag = None
+
+        if etag is not None:
+            not_modified = get_conditional_response(self.request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+        if entry is not None:
+            response = Response(entry['data'])
+        else:
+            self.served_objects, self.served_page = [], False
+            response = view_func(*args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            etag = self.get_etag(self.served_objects)
+            if key:
+                recipe_cache.set_response(key, {
+                    'data': response.data,
+                    'etag': etag,
+                })
+
+        if etag is not None:
+            response['ETag'] = etag
+        return response
+
+
+def _as_dict(obj):
+    # Served objects are model instances or `.values()` rows
+    if isinstance(obj, dict):
+        return obj
+    return {'id': obj.id, 'updated_at': obj.updated_at,
+            'likes_count': obj.likes_count,
+            'bookmarks_count': obj.bookmarks_count,
+            'author_id': obj.author_id, 'category_id': obj.category_id}
+
+
+class SparseFieldsMixin:
+    """
+    Lets clients choose the serialized fields of recipe reads with
+    `?fields=a,b` and drop some with `?omit=a,b`. Lists default to the
+    serializer's compact fields, plus the viewer fields for authenticated
+    users. The queryset is trimmed to match, so
+    unrequested columns are never read and unrequested method fields never
+    run.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def is_sparse_action(self):
+        return getattr(self, 'action', 'list') in self.sparse_actions
+
+    def get_requested_fields(self):
+        if not hasattr(self, '_requested_fields'):
+            params = self.request.query_params
+            self._requested_fields = self.get_serializer_class().select_fields(
+                fields=_split_param(params.get('fields')),
+                omit=_split_param(params.get('omit')),
+                compact=getattr(self, 'action', 'list') == 'list',
+                viewer=self.request.user.is_authenticated,
+            )
+        return self._requested_fields
+
+    def trim_queryset(self, queryset):
+        if not self.is_sparse_action():
+            return queryset
+        return self.get_serializer_class().trim_queryset(
+            queryset, self.get_requested_fields(), viewer_id=self.request.user.id)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.is_sparse_action():
+            kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+
+def _split_param(value):
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class FastListMixin:
+    """
+    Serves list pages through RecipeReadSerializer from `.values()` rows
+    instead of model instances and RecipeSerializer. Relies on
+    SparseFieldsMixin for the field selection.
+    """
+    read_serializer_class = RecipeReadSerializer
+    # Annotations added to every serialized recipe
+    extra_fields = ()
+    # Always fetched: used by validators and cursor positions
+    row_fields = ('id', 'created_at', 'updated_at', 'likes_count',
+                  'bookmarks_count', 'author_id', 'category_id')
+
+    def get_ordering(self):
+        # Same lookup as CursorPagination: an ordering filter wins over the
+        # paginator's own ordering
+        for backend in getattr(self, 'filter_backends', ()):
+            if hasattr(backend, 'get_ordering'):
+                return backend().get_ordering(
+                    self.request, self.get_queryset(), self)
+        return getattr(self.paginator, 'ordering', None)
+
+    def get_row_fields(self):
+        ordering = self.get_ordering() or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return self.row_fields + tuple(name.lstrip('-') for name in ordering)
+
+    def get_reader(self):
+        return self.read_serializer_class(
+            fields=self.get_requested_fields(),
+            context=self.get_serializer_context(),
+            extra_fields=self.extra_fields,
+        )
+
+    def get_rows(self, queryset, reader):
+        """
+        Returns `queryset` as `.values()` rows holding what `reader` needs.
+        """
+        value_fields = dict.fromkeys(
+            reader.get_value_fields() + list(self.get_row_fields()))
+        return queryset.values(*value_fields)
+
+    def list(self, request, *args, **kwargs):
+        reader = self.get_reader()
+        rows = self.get_rows(
+            self.filter_queryset(self.get_queryset()), reader)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(reader.serialize(rows))
+        return self.get_paginated_response(reader.serialize(page))
@@ -1,5 +1,13 @@
-from django.db import models
+from datetime import timedelta
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connections, models
+from django.db.models import (
+    Count, Exists, F, FloatField, Func, OuterRef, Q, Subquery, Sum, Value)
+from django.db.models.functions import Cast, Coalesce, Power
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -21,7 +29,138 @@ def get_default_recipe_category():
     """
     Returns a default recipe type.
     """
-    return RecipeCategory.objects.get_or_create(name='Others')[0]
+    from .refcache import get_category
+
+    return get_category('Others')
+
+
+def _count_subquery(model, field):
+    """
+    Returns a correlated subquery counting rows of `model` pointing at the
+    outer recipe through `field`.
+    """
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class _Epoch(Func):
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+    output_field = FloatField()
+
+
+def _decay(field, now):
+    """
+    Returns 0.5 ** (age of `field` / half-life), so a like or bookmark
+    counts half as much every RECIPE_TRENDING_HALF_LIFE seconds.
+    """
+    age = Value(now.timestamp()) - _Epoch(F(field))
+    return Power(Value(0.5), age / Value(float(settings.RECIPE_TRENDING_HALF_LIFE)))
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """
+        Joins author and category so a page of recipes is serialized in a
+        fixed number of queries, and skips the search document.
+        """
+        return self.select_related('author', 'category').defer('search_vector')
+
+    def with_viewer_flags(self, user_id, flags=('is_liked', 'is_bookmarked')):
+        """
+        Annotates whether the given user liked (`is_liked`) and bookmarked
+        (`is_bookmarked`) each recipe, as EXISTS subqueries of the same query.
+        """
+        subqueries = {
+            'is_liked': lambda: RecipeLike.objects.filter(
+                recipe=OuterRef('pk'), user_id=user_id),
+            'is_bookmarked': lambda: Recipe.bookmarked_by.through.objects.filter(
+                recipe=OuterRef('pk'), profile__user_id=user_id),
+        }
+        return self.annotate(
+            **{flag: Exists(subqueries[flag]()) for flag in flags})
+
+    def with_ingredient_coverage(self, ingredient_ids, max_missing=None):
+        """
+        Recipes using any of the given ingredients, annotated with the number
+        they use (`matched_ingredients`) and the share of their ingredients
+        that is (`coverage`). Matches are counted by joining the ingredients'
+        posting lists once and grouping by recipe, so the other filters of
+        the queryset apply before recipes are ranked. With `max_missing`,
+        only recipes needing at most that many other ingredients are kept.
+        """
+        queryset = (
+            self.filter(ingredient_links__ingredient_id__in=ingredient_ids)
+            .annotate(matched_ingredients=Count('ingredient_links'))
+            .annotate(coverage=Cast(F('matched_ingredients'), FloatField())
+                      / F('ingredient_count'))
+        )
+        if max_missing is not None:
+            queryset = queryset.filter(
+                ingredient_count__lte=F('matched_ingredients') + max_missing)
+        return queryset
+
+    def with_actual_counts(self):
+        """
+        Annotates like/bookmark totals counted from the source tables, used
+        to detect drift in the stored counters.
+        """
+        return self.annotate(
+            actual_likes_count=_count_subquery(RecipeLike, 'recipe'),
+            actual_bookmarks_count=_count_subquery(
+                Recipe.bookmarked_by.through, 'recipe'),
+        )
+
+    def sync_counters(self):
+        """
+        Rewrites the stored like/bookmark counters from the source tables in
+        a single UPDATE.
+        """
+        return self.update(
+            likes_count=_count_subquery(RecipeLike, 'recipe'),
+            bookmarks_count=_count_subquery(
+                Recipe.bookmarked_by.through, 'recipe'),
+        )
+
+    def refresh_trending_scores(self, now=None):
+        """
+        Recomputes the trending score of recipes liked or bookmarked in the
+        last RECIPE_TRENDING_WINDOW seconds, and resets recipes that dropped
+        out of it, in a single UPDATE. Likes and bookmarks are each decayed
+        by their own age.
+        """
+        now = now or timezone.now()
+        window_start = now - timedelta(seconds=settings.RECIPE_TRENDING_WINDOW)
+        recent_likes = RecipeLike.objects.filter(created__gte=window_start)
+        recent_bookmarks = Recipe.bookmarked_by.through.objects.filter(
+            created_at__gte=window_start)
+
+        def decayed_total(events, field):
+            return Coalesce(Subquery(
+                events.filter(recipe=OuterRef('pk'))
+                .order_by()
+                .values('recipe')
+                .annotate(total=Sum(_decay(field, now)))
+                .values('total'),
+                output_field=FloatField(),
+            ), Value(0.0))
+
+        active = self.filter(
+            Q(trending_score__gt=0)
+            | Q(id__in=recent_likes.values('recipe_id'))
+            | Q(id__in=recent_bookmarks.values('recipe_id'))
+        )
+        return active.update(
+            trending_score=decayed_total(recent_likes, 'created')
+            + Value(float(settings.RECIPE_TRENDING_BOOKMARK_WEIGHT))
+            * decayed_total(recent_bookmarks, 'created_at')
+        )
 
 
 class Recipe(models.Model):
@@ -40,18 +179,130 @@ class Recipe(models.Model):
     procedure = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    bookmarks_count = models.PositiveIntegerField(default=0, editable=False)
+    # Time-decayed popularity, refreshed periodically by
+    # recipe.tasks.refresh_trending_scores
+    trending_score = models.FloatField(default=0, editable=False)
+    # Number of distinct parsed ingredients, see recipe.ingredients
+    ingredient_count = models.PositiveIntegerField(default=0, editable=False)
+    # Weighted title (A), desc (B) and ingredients (C) document, maintained
+    # by a database trigger on insert/update (see migration 0006).
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    # Changed in place by SQL (likes, bookmarks, trending refresh) or a
+    # trigger, so the copy of a loaded instance may be stale
+    unsaved_fields = ('likes_count', 'bookmarks_count', 'trending_score',
+                      'search_vector')
 
     class Meta:
-        ordering = ('-created_at', )
+        ordering = ('-created_at', '-id')
+        indexes = [
+            models.Index(fields=['-created_at', '-id'],
+                         name='recipe_created_id_idx'),
+            models.Index(fields=['updated_at', 'id'],
+                         name='recipe_updated_id_idx'),
+            # Orderings offered by RecipeOrderingFilter, scanned in either
+            # direction
+            models.Index(fields=['-likes_count', '-id'],
+                         name='recipe_likes_id_idx'),
+            models.Index(fields=['-bookmarks_count', '-id'],
+                         name='recipe_bookmarks_id_idx'),
+            models.Index(fields=['cook_time', 'id'],
+                         name='recipe_cook_time_id_idx'),
+            GinIndex(fields=['search_vector'],
+                     name='recipe_search_vector_idx'),
+            models.Index(fields=['-trending_score', '-id'],
+                         name='recipe_trending_idx',
+                         condition=Q(trending_score__gt=0)),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        # Updates write back every loaded field: leave out unsaved_fields so
+        # a like or bookmark committed since loading is not overwritten
+        if update_fields is None and not force_insert and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+                and field.name not in self.unsaved_fields
+            ]
+        super().save(force_insert=force_insert, force_update=force_update,
+                     using=using, update_fields=update_fields)
+
     def get_total_number_of_likes(self):
-        return self.recipelike_set.count()
+        return self.likes_count
 
     def get_total_number_of_bookmarks(self):
-        return self.bookmarked_by.count()
+        return self.bookmarks_count
+
+
+class RecipeLikeManager(models.Manager):
+    """
+    Like and unlike in a single statement each: the like row, the
+    recipe's likes_count and the RecipeLikeEvent log change together, and
+    the unique (user, recipe) constraint settles concurrent requests.
+    """
+
+    def like(self, user_id, recipe_id):
+        """
+        Returns (recipe_exists, created).
+        """
+        sql = f"""
+            WITH target AS (
+                SELECT id FROM {Recipe._meta.db_table} WHERE id = %(recipe_id)s
+            ), inserted AS (
+                INSERT INTO {self.model._meta.db_table} (user_id, recipe_id, created)
+                SELECT %(user_id)s, id, NOW() FROM target
+                ON CONFLICT (user_id, recipe_id) DO NOTHING
+                RETURNING recipe_id
+            ), logged AS (
+                INSERT INTO {RecipeLikeEvent._meta.db_table} (recipe_id, liked, created)
+                SELECT recipe_id, TRUE, NOW() FROM inserted
+            ), counted AS (
+                UPDATE {Recipe._meta.db_table}
+                SET likes_count = likes_count + 1, updated_at = NOW()
+                WHERE id IN (SELECT recipe_id FROM inserted)
+                RETURNING id
+            )
+            SELECT EXISTS (SELECT 1 FROM target), EXISTS (SELECT 1 FROM counted)
+        """
+        return self._execute(sql, user_id, recipe_id)
+
+    def unlike(self, user_id, recipe_id):
+        """
+        Returns (recipe_exists, removed).
+        """
+        sql = f"""
+            WITH deleted AS (
+                DELETE FROM {self.model._meta.db_table}
+                WHERE user_id = %(user_id)s AND recipe_id = %(recipe_id)s
+                RETURNING recipe_id
+            ), logged AS (
+                INSERT INTO {RecipeLikeEvent._meta.db_table} (recipe_id, liked, created)
+                SELECT recipe_id, FALSE, NOW() FROM deleted
+            ), counted AS (
+                UPDATE {Recipe._meta.db_table}
+                SET likes_count = GREATEST(likes_count - 1, 0), updated_at = NOW()
+                WHERE id IN (SELECT recipe_id FROM deleted)
+                RETURNING id
+            )
+            SELECT EXISTS (SELECT 1 FROM {Recipe._meta.db_table}
+                           WHERE id = %(recipe_id)s),
+                   EXISTS (SELECT 1 FROM counted)
+        """
+        return self._execute(sql, user_id, recipe_id)
+
+    def _execute(self, sql, user_id, recipe_id):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, {'user_id': user_id, 'recipe_id': recipe_id})
+            return cursor.fetchone()
 
 
 class RecipeLike(models.Model):
@@ -63,5 +314,126 @@ class RecipeLike(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
     created = models.DateTimeField(auto_now_add=True)
 
+    objects = RecipeLikeManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'],
+                                    name='recipelike_user_recipe_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['created'], name='recipelike_created_idx'),
+        ]
+
     def __str__(self):
         return self.user.username
+
+
+class RecipeLikeEvent(models.Model):
+    """
+    Append-only log of likes (liked) and unlikes, written by
+    RecipeLikeManager and consumed by RecipeLikeDaily.objects.rollup
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    liked = models.BooleanField()
+    created = models.DateTimeField(default=timezone.now)
+
+
+class RecipeLikeDailyManager(models.Manager):
+
+    def rollup(self, batch_size=10000):
+        """
+        Moves up to `batch_size` of the oldest like events into the daily
+        totals in a single statement, so each event is counted exactly once
+        even if a worker dies or two run at once. Returns the number of
+        events consumed.
+        """
+        sql = f"""
+            WITH consumed AS (
+                DELETE FROM {RecipeLikeEvent._meta.db_table}
+                WHERE id IN (
+                    SELECT id FROM {RecipeLikeEvent._meta.db_table}
+                    ORDER BY id LIMIT %(batch_size)s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING recipe_id, liked, created
+            ), totals AS (
+                SELECT recipe.author_id, consumed.recipe_id,
+                       (consumed.created AT TIME ZONE %(time_zone)s)::date AS day,
+                       COUNT(*) FILTER (WHERE consumed.liked) AS likes,
+                       COUNT(*) FILTER (WHERE NOT consumed.liked) AS unlikes
+                FROM consumed
+                JOIN {Recipe._meta.db_table} recipe ON recipe.id = consumed.recipe_id
+                GROUP BY 1, 2, 3
+            ), upserted AS (
+                INSERT INTO {self.model._meta.db_table}
+                    (author_id, recipe_id, day, likes, unlikes)
+                SELECT * FROM totals
+                ON CONFLICT (recipe_id, day) DO UPDATE
+                SET likes = {self.model._meta.db_table}.likes + EXCLUDED.likes,
+                    unlikes = {self.model._meta.db_table}.unlikes + EXCLUDED.unlikes
+            )
+            SELECT COUNT(*) FROM consumed
+        """
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, {'batch_size': batch_size,
+                                 'time_zone': settings.TIME_ZONE})
+            return cursor.fetchone()[0]
+
+
+class RecipeLikeDaily(models.Model):
+    """
+    Likes and unlikes of a recipe per day, for author analytics
+    """
+    author = models.ForeignKey(settings.AUTH_USER_MODEL,
+                               on_delete=models.CASCADE)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    day = models.DateField()
+    likes = models.PositiveIntegerField(default=0)
+    unlikes = models.PositiveIntegerField(default=0)
+
+    objects = RecipeLikeDailyManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'day'],
+                                    name='recipelikedaily_recipe_day_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['author', 'day'],
+                         name='recipelikedaily_author_day_idx'),
+        ]
+
+
+class Ingredient(models.Model):
+    """
+    Normalized ingredient name parsed from recipe ingredient lists
+    """
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeIngredient(models.Model):
+    """
+    Inverted index entry linking an ingredient to a recipe using it
+    """
+    ingredient = models.ForeignKey(
+        Ingredient, related_name='recipe_links', on_delete=models.CASCADE)
+    recipe = models.ForeignKey(
+        Recipe, related_name='ingredient_links', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            # Posting lists: recipes by ingredient, index-only scans
+            models.UniqueConstraint(fields=['ingredient', 'recipe'],
+                                    name='recipeingredient_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['recipe', 'ingredient'],
+                         name='recipeingredient_recipe_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.ingredient_id}'
@@ -0,0 +1,70 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the recipe feed, ordered like Recipe.Meta.ordering
+    so pages are served from the (created_at, id) index without COUNT or
+    OFFSET scans.
+    """
+    ordering = ('-created_at', '-id')
+
+
+class RecipeSearchPagination(CursorPagination):
+    """
+    Cursor pagination over search results, ordered by relevance.
+    """
+    ordering = ('-rank', '-id')
+
+
+class RecipeTrendingPagination(CursorPagination):
+    """
+    Cursor pagination over trending recipes, served from the partial
+    (trending_score, id) index.
+    """
+    ordering = ('-trending_score', '-id')
+
+
+class RecipeCoveragePagination(CursorPagination):
+    """
+    Cursor pagination over ingredient matches, best coverage first.
+    """
+    ordering = ('-coverage', '-matched_ingredients', '-id')
+
+
+class RecipeSavedPagination(CursorPagination):
+    """
+    Cursor pagination over a user's bookmarks, most recently saved first,
+    served from the (profile, created_at, id) bookmark index.
+    """
+    ordering = ('-saved_at', '-bookmark_id')
+
+
+class PaginationModeMixin:
+    """
+    Lets clients choose between page-number and cursor pagination per
+    request with `?pagination=page|cursor`. Views set
+    `default_pagination_mode` to pick the mode used when none is requested.
+    """
+    pagination_classes = {
+        'page': PageNumberPagination,
+        'cursor': RecipeCursorPagination,
+    }
+    default_pagination_mode = 'page'
+
+    def get_pagination_mode(self):
+        params = self.request.query_params
+        if 'cursor' in params:
+            return 'cursor'
+        mode = params.get('pagination', self.default_pagination_mode)
+        if mode not in self.pagination_classes:
+            return self.default_pagination_mode
+        return mode
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.pagination_classes[
+                self.get_pagination_mode()]
+            self._paginator = pagination_class()
+        return self._paginator
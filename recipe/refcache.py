@@ -0,0 +1,200 @@
+"""
+Two-tier cache for small, rarely changing reference data.
+
+Lookups go to an in-process LRU with a short TTL first, then to the shared
+cache (Redis) and only then to the database. Writes invalidate both tiers
+of the current process and the shared tier through signals; other
+processes drop their local copy when its TTL expires.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import RecipeCategory
+
+STATS_KEY = 'refcache:stats:{}:{}'
+STATS_OUTCOMES = ('local_hits', 'shared_hits', 'misses')
+# Lookups counted in process before the counters are added to the shared ones
+STATS_FLUSH_EVERY = 100
+
+
+def get_cache():
+    return caches[settings.REFERENCE_CACHE_ALIAS]
+
+
+class TwoTierCache:
+    """
+    Maps keys to values loaded by `load_many(keys) -> {key: value}`.
+    Keys the loader does not return are not cached.
+    """
+
+    def __init__(self, name, load_many, maxsize=None, ttl=None):
+        self.name = name
+        self.load_many = load_many
+        self.maxsize = maxsize or settings.REFERENCE_CACHE_LOCAL_MAXSIZE
+        self.ttl = ttl or settings.REFERENCE_CACHE_LOCAL_TTL
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def shared_key(self, key):
+        return f'refcache:{self.name}:{key}'
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys):
+        keys = list(dict.fromkeys(keys))
+        found = self._get_local(keys)
+        missing = [key for key in keys if key not in found]
+        shared_hits = {}
+        if missing:
+            shared = get_cache().get_many(
+                [self.shared_key(key) for key in missing]) or {}
+            shared_hits = {
+                key: shared[self.shared_key(key)]
+                for key in missing if self.shared_key(key) in shared
+            }
+            loaded = {}
+            missing = [key for key in missing if key not in shared_hits]
+            if missing:
+                loaded = self.load_many(missing)
+                self._set_shared(loaded)
+            self._set_local({**shared_hits, **loaded})
+            found.update(shared_hits)
+            found.update(loaded)
+        self._record(local_hits=len(keys) - len(shared_hits) - len(missing),
+                     shared_hits=len(shared_hits), misses=len(missing))
+        return found
+
+    def set(self, key, value):
+        self._set_shared({key: value})
+        self._set_local({key: value})
+
+    def invalidate(self, *keys):
+        # Drop now, and again after commit so a value loaded from pre-commit
+        # data in between is dropped as well.
+        self._invalidate(keys)
+        transaction.on_commit(lambda: self._invalidate(keys))
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def _invalidate(self, keys):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+        get_cache().delete_many([self.shared_key(key) for key in keys])
+
+    def _get_local(self, keys):
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._local.get(key)
+                if entry is None:
+                    continue
+                if entry[0] <= now:
+                    del self._local[key]
+                    continue
+                self._local.move_to_end(key)
+                found[key] = entry[1]
+        return found
+
+    def _set_local(self, values):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._local[key] = (expires, value)
+                self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def _set_shared(self, values):
+        if values:
+            get_cache().set_many(
+                {self.shared_key(key): value for key, value in values.items()},
+                timeout=settings.REFERENCE_CACHE_TIMEOUT)
+
+    def _record(self, **counts):
+        with self._lock:
+            self._counts.update(counts)
+            if sum(self._counts.values()) < STATS_FLUSH_EVERY:
+                return
+            counts, self._counts = self._counts, Counter()
+        self._flush_stats(counts)
+
+    def _flush_stats(self, counts):
+        cache = get_cache()
+        for outcome, count in counts.items():
+            if not count:
+                continue
+            key = STATS_KEY.format(self.name, outcome)
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, count)
+
+    def get_stats(self):
+        """
+        Returns lookup counters of every process and the hit ratio.
+        """
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        self._flush_stats(counts)
+        keys = [STATS_KEY.format(self.name, outcome) for outcome in STATS_OUTCOMES]
+        shared = get_cache().get_many(keys) or {}
+        stats = {outcome: shared.get(key, 0)
+                 for outcome, key in zip(STATS_OUTCOMES, keys)}
+        total = sum(stats.values())
+        hits = stats['local_hits'] + stats['shared_hits']
+        stats['hit_ratio'] = hits / total if total else 0.0
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts.clear()
+        get_cache().delete_many(
+            [STATS_KEY.format(self.name, outcome) for outcome in STATS_OUTCOMES])
+
+
+def _load_category_names(ids):
+    return dict(RecipeCategory.objects.filter(id__in=ids).values_list('id', 'name'))
+
+
+def _load_category_ids(names):
+    # Like get_or_create, the first category with a name wins
+    categories = (RecipeCategory.objects.filter(name__in=names)
+                  .order_by('-id').values_list('name', 'id'))
+    return dict(categories)
+
+
+def _load_usernames(ids):
+    users = get_user_model().objects.filter(id__in=ids)
+    return dict(users.values_list('id', 'username'))
+
+
+category_names = TwoTierCache('category_name', _load_category_names)
+category_ids = TwoTierCache('category_id', _load_category_ids)
+usernames = TwoTierCache('username', _load_usernames)
+
+reference_caches = (category_names, category_ids, usernames)
+
+
+def get_category(name):
+    """
+    Returns the category with the given name, creating it if needed.
+    """
+    category_id = category_ids.get(name)
+    if category_id is None:
+        category, _ = RecipeCategory.objects.get_or_create(name=name)
+        category_ids.set(name, category.id)
+        return category
+    return RecipeCategory.from_db('default', ['id', 'name'], [category_id, name])
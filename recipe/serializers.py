@@ -1,5 +1,11 @@
+from datetime import timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 
+from . import likebuffer, refcache
 from .models import Recipe, RecipeCategory, RecipeLike
 
 
@@ -9,7 +15,36 @@ class RecipeCategorySerializer(serializers.ModelSerializer):
         fields = ('id', 'name')
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    """
+    Loads the usernames and category names of a page of recipes from the
+    reference cache, and their buffered likes, in one lookup each before
+    serializing them.
+    """
+
+    def to_representation(self, data):
+        recipes = list(data.all() if hasattr(data, 'all') else data)
+        fields = self.child.fields
+        if 'category_name' in fields:
+            refcache.category_names.get_many(
+                {recipe.category_id for recipe in recipes})
+        if 'username' in fields:
+            refcache.usernames.get_many({recipe.author_id for recipe in recipes})
+        if 'total_number_of_likes' in fields:
+            self.child.like_deltas = likebuffer.get_deltas(
+                recipe.id for recipe in recipes)
+        if 'is_liked' in fields:
+            self.child.viewer_likes = likebuffer.get_user_likes(
+                self.child.get_viewer_id(), [recipe.id for recipe in recipes])
+        return super().to_representation(recipes)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
+    """
+    Accepts a `fields` keyword to serialize only a subset of its fields.
+    The viewer fields (`is_liked`, `is_bookmarked`) are only serialized when
+    asked for by name and are read from `with_viewer_flags` annotations.
+    """
     author = serializers.PrimaryKeyRelatedField(read_only=True)
     username = serializers.SerializerMethodField()
     category_name = serializers.SerializerMethodField()
@@ -22,23 +57,105 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'category', 'category_name', 'picture', 'title', 'desc',
                   'cook_time', 'ingredients', 'procedure', 'author', 'username',
                   'total_number_of_likes', 'total_number_of_bookmarks')
+        # Card representation used by list endpoints unless fields are asked for
+        compact_fields = ('id', 'category', 'category_name', 'picture', 'title',
+                          'desc', 'cook_time', 'author', 'username',
+                          'total_number_of_likes', 'total_number_of_bookmarks')
+        # Relations joined to serve a field, and columns that can be deferred.
+        # Usernames and category names come from the reference cache.
+        related_fields = {'category': 'category'}
+        deferrable_fields = ('picture', 'title', 'desc', 'cook_time',
+                             'ingredients', 'procedure')
+        list_serializer_class = RecipeListSerializer
+        # Flags of the requesting user, for authenticated viewers only
+        viewer_fields = ('is_liked', 'is_bookmarked')
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in self.Meta.viewer_fields:
+                if name in fields:
+                    self.fields[name] = serializers.SerializerMethodField()
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def select_fields(cls, fields=None, omit=None, compact=False, viewer=False):
+        """
+        Returns the field names to serialize for the given `fields`/`omit`
+        lists, ignoring unknown names. `viewer` adds the viewer fields.
+        """
+        viewer_fields = cls.Meta.viewer_fields if viewer else ()
+        if fields:
+            selected = [name for name in cls.Meta.fields + viewer_fields
+                        if name in fields]
+        elif compact:
+            selected = list(cls.Meta.compact_fields + viewer_fields)
+        else:
+            selected = list(cls.Meta.fields + viewer_fields)
+        if omit:
+            selected = [name for name in selected if name not in omit]
+        return tuple(selected)
+
+    @classmethod
+    def trim_queryset(cls, queryset, fields, viewer_id=None):
+        """
+        Defers columns and skips joins that the given fields do not need,
+        and annotates the requested viewer fields for `viewer_id`.
+        """
+        related = sorted({cls.Meta.related_fields[name]
+                          for name in fields if name in cls.Meta.related_fields})
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        deferred = [name for name in cls.Meta.deferrable_fields
+                    if name not in fields]
+        queryset = queryset.defer(*deferred)
+        flags = [name for name in cls.Meta.viewer_fields if name in fields]
+        if flags and viewer_id is not None:
+            queryset = queryset.with_viewer_flags(viewer_id, flags)
+        return queryset
+
+    def get_viewer_id(self):
+        request = self.context.get('request')
+        return request.user.id if request is not None else None
 
     def get_username(self, obj):
-        return obj.author.username
+        return refcache.usernames.get(obj.author_id)
 
     def get_category_name(self, obj):
-        return obj.category.name
+        return refcache.category_names.get(obj.category_id)
 
     def get_total_number_of_likes(self, obj):
-        return obj.get_total_number_of_likes()
+        like_deltas = getattr(self, 'like_deltas', None)
+        if like_deltas is None:
+            like_deltas = likebuffer.get_deltas([obj.id])
+        return max(obj.get_total_number_of_likes() + like_deltas.get(obj.id, 0), 0)
 
     def get_total_number_of_bookmarks(self, obj):
         return obj.get_total_number_of_bookmarks()
 
+    def get_is_liked(self, obj):
+        viewer_likes = getattr(self, 'viewer_likes', None)
+        if viewer_likes is None:
+            viewer_likes = likebuffer.get_user_likes(self.get_viewer_id(), [obj.id])
+        if obj.id in viewer_likes:
+            return viewer_likes[obj.id]
+        if not hasattr(obj, 'is_liked'):
+            return RecipeLike.objects.filter(
+                recipe=obj, user_id=self.get_viewer_id()).exists()
+        return obj.is_liked
+
+    def get_is_bookmarked(self, obj):
+        if not hasattr(obj, 'is_bookmarked'):
+            return Recipe.bookmarked_by.through.objects.filter(
+                recipe=obj, profile__user_id=self.get_viewer_id()).exists()
+        return obj.is_bookmarked
+
     def create(self, validated_data):
         category = validated_data.pop('category')
-        category_instance, created = RecipeCategory.objects.get_or_create(
-            **category)
+        category_instance = refcache.get_category(category['name'])
         recipe_instance = Recipe.objects.create(
             **validated_data, category=category_instance)
         return recipe_instance
@@ -54,9 +171,156 @@ class RecipeSerializer(serializers.ModelSerializer):
         return super(RecipeSerializer, self).update(instance, validated_data)
 
 
+class RecipeReadSerializer:
+    """
+    Read-only counterpart of RecipeSerializer for list endpoints. Builds the
+    same output from `.values()` rows with one precomputed getter per field,
+    skipping model instances and per-field serializer dispatch.
+    """
+    # values() lookups needed by each RecipeSerializer field
+    value_fields = {
+        'id': ('id',),
+        'category': ('category_id',),
+        'category_name': ('category_id',),
+        'picture': ('picture',),
+        'title': ('title',),
+        'desc': ('desc',),
+        'cook_time': ('cook_time',),
+        'ingredients': ('ingredients',),
+        'procedure': ('procedure',),
+        'author': ('author_id',),
+        'username': ('author_id',),
+        'total_number_of_likes': ('id', 'likes_count'),
+        'total_number_of_bookmarks': ('bookmarks_count',),
+        'is_liked': ('id', 'is_liked'),
+        'is_bookmarked': ('is_bookmarked',),
+    }
+
+    def __init__(self, fields=None, context=None, extra_fields=()):
+        # An empty selection serializes no fields, as RecipeSerializer does
+        self.fields = tuple(
+            fields if fields is not None else RecipeSerializer.Meta.fields)
+        # Row keys (e.g. annotations) output as they are after the fields
+        self.extra_fields = tuple(extra_fields)
+        self.request = (context or {}).get('request')
+        self.storage = Recipe._meta.get_field('picture').storage
+        # Reference data of the serialized rows, see prefetch()
+        self.category_names = {}
+        self.usernames = {}
+        self.like_deltas = {}
+        self.viewer_likes = {}
+        self.getters = [(name, self.get_getter(name)) for name in self.fields]
+        self.getters += [(name, itemgetter(name)) for name in self.extra_fields]
+
+    def get_value_fields(self):
+        """
+        Returns the `.values()` lookups needed to serialize the fields.
+        """
+        lookups = {}
+        for name in self.fields:
+            lookups.update(dict.fromkeys(self.value_fields[name]))
+        lookups.update(dict.fromkeys(self.extra_fields))
+        return list(lookups)
+
+    def get_getter(self, name):
+        if name == 'category':
+            return lambda row: {'id': row['category_id'],
+                                'name': self.get_category_name(row)}
+        if name == 'category_name':
+            return self.get_category_name
+        if name == 'username':
+            return self.get_username
+        if name == 'picture':
+            return self.get_picture_url
+        if name == 'total_number_of_likes':
+            return self.get_total_number_of_likes
+        if name == 'is_liked':
+            return self.get_is_liked
+        if name == 'cook_time':
+            return lambda row: (row['cook_time'].isoformat()
+                                if row['cook_time'] is not None else None)
+        return itemgetter(self.value_fields[name][0])
+
+    def get_category_name(self, row):
+        if row['category_id'] not in self.category_names:
+            self.category_names[row['category_id']] = (
+                refcache.category_names.get(row['category_id']))
+        return self.category_names[row['category_id']]
+
+    def get_username(self, row):
+        if row['author_id'] not in self.usernames:
+            self.usernames[row['author_id']] = (
+                refcache.usernames.get(row['author_id']))
+        return self.usernames[row['author_id']]
+
+    def get_total_number_of_likes(self, row):
+        return max(row['likes_count'] + self.like_deltas.get(row['id'], 0), 0)
+
+    def get_is_liked(self, row):
+        return self.viewer_likes.get(row['id'], row['is_liked'])
+
+    def get_picture_url(self, row):
+        # Mirrors rest_framework.fields.FileField.to_representation
+        if not row['picture']:
+            return None
+        url = self.storage.url(row['picture'])
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def prefetch(self, rows):
+        """
+        Loads the category names and usernames of `rows` from the reference
+        cache, and their buffered likes, in one lookup each.
+        """
+        if {'category', 'category_name'} & set(self.fields):
+            self.category_names.update(refcache.category_names.get_many(
+                {row['category_id'] for row in rows}
+                - self.category_names.keys()))
+        if 'username' in self.fields:
+            self.usernames.update(refcache.usernames.get_many(
+                {row['author_id'] for row in rows} - self.usernames.keys()))
+        if 'total_number_of_likes' in self.fields:
+            self.like_deltas.update(likebuffer.get_deltas(row['id'] for row in rows))
+        if 'is_liked' in self.fields and self.request is not None:
+            self.viewer_likes.update(likebuffer.get_user_likes(
+                self.request.user.id, [row['id'] for row in rows]))
+
+    def to_representation(self, row):
+        return {name: getter(row) for name, getter in self.getters}
+
+    def serialize(self, rows):
+        rows = list(rows)
+        self.prefetch(rows)
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
 class RecipeLikeSerializer(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = RecipeLike
         fields = ('id', 'user', 'recipe')
+
+
+class RecipeLikeAnalyticsQuerySerializer(serializers.Serializer):
+    """
+    Validates the date range of the like analytics endpoint. The range is
+    inclusive and defaults to the last RECIPE_ANALYTICS_DEFAULT_DAYS days.
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    recipe = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, data):
+        end = data.get('end') or timezone.localdate()
+        start = data.get('start') or end - timedelta(
+            days=settings.RECIPE_ANALYTICS_DEFAULT_DAYS - 1)
+        if start > end:
+            raise serializers.ValidationError(
+                {'start': ['Must not be after end.']})
+        if (end - start).days >= settings.RECIPE_ANALYTICS_MAX_DAYS:
+            raise serializers.ValidationError(
+                {'start': [f'At most {settings.RECIPE_ANALYTICS_MAX_DAYS} days are allowed.']})
+        return {**data, 'start': start, 'end': end}
@@ -0,0 +1,51 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache as recipe_cache
+from . import refcache
+from .ingredients import index_recipes
+from .models import Recipe, RecipeCategory
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_cache(sender, instance, **kwargs):
+    recipe_cache.invalidate_recipe(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe_ingredients(sender, instance, created, raw=False,
+                             update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is None or 'ingredients' in update_fields:
+        index_recipes([instance], created=created)
+
+
+@receiver(post_save, sender=RecipeCategory)
+@receiver(post_delete, sender=RecipeCategory)
+def invalidate_recipe_category_cache(sender, instance, **kwargs):
+    previous_name = getattr(instance, '_previous_name', None)
+    if previous_name is not None and previous_name != instance.name:
+        recipe_cache.invalidate_names()
+    else:
+        recipe_cache.invalidate_all()
+
+
+@receiver(pre_save, sender=RecipeCategory)
+def remember_category_name(sender, instance, raw=False, **kwargs):
+    # The cache entry of the previous name must go on rename
+    instance._previous_name = None
+    if instance.pk and not raw:
+        instance._previous_name = (
+            RecipeCategory.objects.filter(pk=instance.pk)
+            .values_list('name', flat=True).first())
+
+
+@receiver(post_save, sender=RecipeCategory)
+@receiver(post_delete, sender=RecipeCategory)
+def invalidate_category_reference_cache(sender, instance, **kwargs):
+    refcache.category_names.invalidate(instance.id)
+    names = {instance.name, getattr(instance, '_previous_name', None)} - {None}
+    refcache.category_ids.invalidate(*names)
+
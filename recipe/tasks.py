@@ -0,0 +1,55 @@
+import logging
+from celery import shared_task
+from django.conf import settings
+
+from recipe import likebuffer
+from recipe.models import Recipe, RecipeLikeDaily
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_trending_scores():
+    """
+    Refresh the precomputed trending score of recently active recipes.
+    """
+    try:
+        logger.debug("Enter refresh_trending_scores")
+        updated = Recipe.objects.refresh_trending_scores()
+        logger.debug(f"Exit refresh_trending_scores: {updated} recipes: success")
+    except Exception as e:
+        logger.error(f"Error refresh_trending_scores: {e}", exc_info=True)
+
+
+@shared_task
+def flush_like_buffer():
+    """
+    Write likes buffered in Redis to the database.
+    """
+    try:
+        logger.debug("Enter flush_like_buffer")
+        if not likebuffer.is_enabled():
+            return
+        flushed = likebuffer.flush()
+        logger.debug(f"Exit flush_like_buffer: {flushed} likes: success")
+    except Exception as e:
+        logger.error(f"Error flush_like_buffer: {e}", exc_info=True)
+
+
+@shared_task
+def rollup_recipe_likes():
+    """
+    Move logged like events into the daily like totals.
+    """
+    try:
+        logger.debug("Enter rollup_recipe_likes")
+        batch_size = settings.RECIPE_LIKE_ROLLUP_BATCH_SIZE
+        total = 0
+        while True:
+            consumed = RecipeLikeDaily.objects.rollup(batch_size)
+            total += consumed
+            if consumed < batch_size:
+                break
+        logger.debug(f"Exit rollup_recipe_likes: {total} events: success")
+    except Exception as e:
+        logger.error(f"Error rollup_recipe_likes: {e}", exc_info=True)
@@ -1,12 +1,64 @@
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from django.contrib.auth import get_user_model
-from recipe.models import Recipe, RecipeCategory, RecipeLike
+from recipe import cache as recipe_cache
+from recipe import likebuffer
+from recipe import refcache
+from recipe.ingredients import parse_ingredients
+from recipe.models import (
+    Recipe,
+    RecipeCategory,
+    RecipeIngredient,
+    RecipeLike,
+    RecipeLikeDaily,
+    RecipeLikeEvent,
+)
+from recipe.pagination import RecipeCursorPagination
+from recipe.serializers import RecipeReadSerializer, RecipeSerializer
+from recipe.tasks import (
+    flush_like_buffer,
+    refresh_trending_scores,
+    rollup_recipe_likes,
+)
+from users.models import Bookmark, Profile
 
 User = get_user_model()
 
+# Tests never touch the Redis of REDIS_URL, which is shared with a running
+# server and the Celery broker
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+def warm_reference_cache(recipes=None):
+    """
+    Loads category names and usernames into the reference cache, as on a
+    running server.
+    """
+    recipes = Recipe.objects.all() if recipes is None else recipes
+    refcache.category_names.get_many({recipe.category_id for recipe in recipes})
+    refcache.usernames.get_many({recipe.author_id for recipe in recipes})
+
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class RecipeTests(APITestCase):
 
     def setUp(self):
@@ -125,3 +177,1747 @@ class RecipeTests(APITestCase):
             reverse("recipe:recipe-like", kwargs={"pk": self.recipe.id})
         )
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeQueryCountTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.other = User.objects.create_user(
+            username="otheruser",
+            email="otheruser@example.com",
+            password="strongpassword123",
+        )
+        self.recipes = []
+        for i in range(5):
+            category = RecipeCategory.objects.create(name=f"Category {i}")
+            recipe = Recipe.objects.create(
+                title=f"Recipe {i}",
+                desc="A description",
+                cook_time="00:30:00",
+                ingredients="Sugar, Flour",
+                procedure="Mix and bake",
+                author=self.user if i % 2 else self.other,
+                category=category,
+            )
+            RecipeLike.objects.create(user=self.user, recipe=recipe)
+            RecipeLike.objects.create(user=self.other, recipe=recipe)
+            self.user.profile.bookmarks.add(recipe)
+            self.recipes.append(recipe)
+        Recipe.objects.all().sync_counters()
+        warm_reference_cache(self.recipes)
+
+    def test_list_recipes_constant_queries(self):
+        # One COUNT for the paginator and one SELECT for the page.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("recipe:recipe-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 5)
+        for item in response.data["results"]:
+            self.assertEqual(item["total_number_of_likes"], 2)
+            self.assertEqual(item["total_number_of_bookmarks"], 1)
+            self.assertTrue(item["username"] in ("testuser", "otheruser"))
+            self.assertEqual(item["category_name"], item["category"]["name"])
+
+    def test_retrieve_recipe_constant_queries(self):
+        recipe = self.recipes[0]
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["username"], "otheruser")
+        self.assertEqual(response.data["total_number_of_likes"], 2)
+        self.assertEqual(response.data["total_number_of_bookmarks"], 1)
+
+    def test_bookmark_list_constant_queries(self):
+        self.client.force_authenticate(user=self.user)
+        # One SELECT for the cursor page, joined to the profile by user id.
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("users:user-bookmark", kwargs={"pk": self.user.id})
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertEqual(response.data["results"][0]["total_number_of_likes"], 2)
+
+    def test_list_recipes_cold_reference_cache(self):
+        refcache.category_names.invalidate(*(r.category_id for r in self.recipes))
+        refcache.usernames.invalidate(self.user.id, self.other.id)
+        # One lookup per reference table on top of the page queries.
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("recipe:recipe-list"))
+        self.assertEqual(
+            {item["username"] for item in response.data["results"]},
+            {"testuser", "otheruser"},
+        )
+        with self.assertNumQueries(2):
+            self.client.get(reverse("recipe:recipe-list") + "?page=1")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeViewerFlagsTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.other = User.objects.create_user(
+            username="otheruser",
+            email="otheruser@example.com",
+            password="strongpassword123",
+        )
+        category = RecipeCategory.objects.create(name="Dessert")
+        self.recipes = [
+            Recipe.objects.create(
+                title=f"Recipe {i}",
+                desc="A description",
+                cook_time="00:30:00",
+                ingredients="Sugar, Flour",
+                procedure="Mix and bake",
+                author=self.other,
+                category=category,
+            )
+            for i in range(4)
+        ]
+        RecipeLike.objects.like(self.user.id, self.recipes[0].id)
+        RecipeLike.objects.like(self.other.id, self.recipes[1].id)
+        self.user.profile.bookmarks.add(self.recipes[0], self.recipes[2])
+        warm_reference_cache(self.recipes)
+        self.client.force_authenticate(user=self.user)
+
+    def get_flags(self, items):
+        return {
+            item["id"]: (item["is_liked"], item["is_bookmarked"]) for item in items
+        }
+
+    def expected_flags(self):
+        return {
+            self.recipes[0].id: (True, True),
+            self.recipes[1].id: (False, False),
+            self.recipes[2].id: (False, True),
+            self.recipes[3].id: (False, False),
+        }
+
+    def test_list_flags_in_page_query(self):
+        # One COUNT for the paginator and one SELECT with the flags.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("recipe:recipe-list"))
+        self.assertEqual(self.get_flags(response.data["results"]), self.expected_flags())
+
+    def test_retrieve_and_batch_flags(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("recipe:recipe-detail", kwargs={"pk": self.recipes[0].id})
+            )
+        self.assertTrue(response.data["is_liked"])
+        self.assertTrue(response.data["is_bookmarked"])
+        ids = ",".join(str(recipe.id) for recipe in self.recipes)
+        response = self.client.get(reverse("recipe:recipe-batch") + f"?ids={ids}")
+        self.assertEqual(self.get_flags(response.data["results"]), self.expected_flags())
+
+    def test_sparse_fields_select_flags(self):
+        response = self.client.get(reverse("recipe:recipe-list") + "?fields=id,is_liked")
+        self.assertEqual(set(response.data["results"][0]), {"id", "is_liked"})
+        response = self.client.get(reverse("recipe:recipe-list") + "?omit=is_bookmarked")
+        self.assertNotIn("is_bookmarked", response.data["results"][0])
+        self.assertIn("is_liked", response.data["results"][0])
+
+    def test_anonymous_viewers_get_no_flags(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse("recipe:recipe-list") + "?fields=id,is_liked")
+        self.assertEqual(set(response.data["results"][0]), {"id"})
+        response = self.client.get(reverse("recipe:recipe-list"))
+        self.assertNotIn("is_liked", response.data["results"][0])
+
+    def test_etag_varies_per_viewer(self):
+        url = reverse("recipe:recipe-detail", kwargs={"pk": self.recipes[0].id})
+        etag = self.client.get(url)["ETag"]
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["is_liked"], False)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeCounterTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = Recipe.objects.create(
+            title="Test Recipe",
+            desc="A description of the test recipe",
+            cook_time="00:30:00",
+            ingredients="Sugar, Flour",
+            procedure="Mix and bake",
+            author=self.user,
+            category=RecipeCategory.objects.create(name="Dessert"),
+        )
+
+    def test_like_and_unlike_update_counter(self):
+        url = reverse("recipe:recipe-like", kwargs={"pk": self.recipe.id})
+        self.client.post(url)
+        self.client.post(url)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes_count, 1)
+        self.client.delete(url)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes_count, 0)
+
+    def test_like_and_unlike_single_statement(self):
+        url = reverse("recipe:recipe-like", kwargs={"pk": self.recipe.id})
+        with self.assertNumQueries(1):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(1):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertNumQueries(1):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(RecipeLike.objects.exists())
+
+    def test_like_missing_recipe(self):
+        url = reverse("recipe:recipe-like", kwargs={"pk": self.recipe.id + 1000})
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND
+        )
+
+    def test_bookmark_add_and_remove_update_counter(self):
+        url = reverse("users:user-bookmark", kwargs={"pk": self.user.id})
+        self.client.post(url, {"id": self.recipe.id}, format="json")
+        self.client.post(url, {"id": self.recipe.id}, format="json")
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.bookmarks_count, 1)
+        self.client.delete(url, {"id": self.recipe.id}, format="json")
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.bookmarks_count, 0)
+
+    def test_recipe_update_keeps_concurrent_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe.id)
+        RecipeLike.objects.like(self.user.id, self.recipe.id)
+        Profile.objects.add_bookmarks(self.user.id, [self.recipe.id])
+        recipe.title = "Renamed Recipe"
+        recipe.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, "Renamed Recipe")
+        self.assertEqual(self.recipe.likes_count, 1)
+        self.assertEqual(self.recipe.bookmarks_count, 1)
+
+    def test_sync_recipe_counters_repairs_drift(self):
+        RecipeLike.objects.create(user=self.user, recipe=self.recipe)
+        self.user.profile.bookmarks.add(self.recipe)
+        call_command("sync_recipe_counters", "--batch-size", "1", stdout=StringIO())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes_count, 1)
+        self.assertEqual(self.recipe.bookmarks_count, 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeLikeConcurrencyTests(TransactionTestCase):
+
+    threads = 12
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f"user{i}",
+                email=f"user{i}@example.com",
+                password="strongpassword123",
+            )
+            for i in range(self.threads)
+        ]
+        self.recipe = Recipe.objects.create(
+            title="Test Recipe",
+            desc="A description of the test recipe",
+            cook_time="00:30:00",
+            ingredients="Sugar, Flour",
+            procedure="Mix and bake",
+            author=self.users[0],
+            category=RecipeCategory.objects.create(name="Dessert"),
+        )
+        self.url = reverse("recipe:recipe-like", kwargs={"pk": self.recipe.id})
+
+    def hammer(self, method, users):
+        barrier = threading.Barrier(len(users))
+
+        def request(user):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            try:
+                barrier.wait()
+                return getattr(client, method)(self.url).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(users)) as executor:
+            return sorted(executor.map(request, users))
+
+    def test_concurrent_double_taps_like_once(self):
+        statuses = self.hammer("post", [self.users[1]] * self.threads)
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(statuses.count(status.HTTP_400_BAD_REQUEST), self.threads - 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes_count, 1)
+        self.assertEqual(RecipeLike.objects.count(), 1)
+
+        statuses = self.hammer("delete", [self.users[1]] * self.threads)
+        self.assertEqual(statuses.count(status.HTTP_200_OK), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes_count, 0)
+
+    def test_concurrent_likes_from_many_users(self):
+        statuses = self.hammer("post", self.users)
+        self.assertEqual(statuses, [status.HTTP_201_CREATED] * self.threads)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes_count, self.threads)
+        self.assertEqual(RecipeLike.objects.count(), self.threads)
+
+
+def redis_available():
+    try:
+        return likebuffer.get_client().ping()
+    except Exception:
+        return False
+
+
+@skipUnless(redis_available(), "Redis is not reachable")
+@override_settings(
+    # Only the buffer uses Redis, under its own prefix
+    CACHES={**LOCMEM_CACHES, "like_buffer": settings.CACHES["default"]},
+    RECIPE_LIKE_BUFFER_ALIAS="like_buffer",
+    RECIPE_LIKE_BUFFER_ENABLED=True,
+    RECIPE_LIKE_BUFFER_PREFIX="test:likes:buffer:",
+)
+class RecipeLikeBufferTests(APITestCase):
+
+    def setUp(self):
+        self.clear_buffer()
+        self.addCleanup(self.clear_buffer)
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.other = User.objects.create_user(
+            username="otheruser",
+            email="otheruser@example.com",
+            password="strongpassword123",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = Recipe.objects.create(
+            title="Test Recipe",
+            desc="A description of the test recipe",
+            cook_time="00:30:00",
+            ingredients="Sugar, Flour",
+            procedure="Mix and bake",
+            author=self.user,
+            category=RecipeCategory.objects.create(name="Dessert"),
+        )
+        self.url = reverse("recipe:recipe-like", kwargs={"pk": self.recipe.id})
+        self.detail_url = reverse("recipe:recipe-detail", kwargs={"pk": self.recipe.id})
+
+    def clear_buffer(self):
+        with self.settings(RECIPE_LIKE_BUFFER_PREFIX="test:likes:buffer:"):
+            client = likebuffer.get_client()
+            keys = list(client.scan_iter("test:likes:buffer:*"))
+            if keys:
+                client.delete(*keys)
+
+    def get_likes(self):
+        return self.client.get(self.detail_url).data["total_number_of_likes"]
+
+    def test_buffered_like_and_unlike(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(RecipeLike.objects.exists())
+        self.assertEqual(self.get_likes(), 1)
+        response = self.client.get(reverse("recipe:recipe-list"))
+        self.assertEqual(response.data["results"][0]["total_number_of_likes"], 1)
+        self.assertTrue(response.data["results"][0]["is_liked"])
+        self.assertTrue(self.client.get(self.detail_url).data["is_liked"])
+
+        self.assertEqual(self.client.delete(self.url).status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.client.delete(self.url).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(self.get_likes(), 0)
+
+    def test_like_missing_recipe(self):
+        url = reverse("recipe:recipe-like", kwargs={"pk": self.recipe.id + 1000})
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_flush_persists_likes(self):
+        RecipeLike.objects.like(self.other.id, self.recipe.id)
+        likebuffer.like(self.user.id, self.recipe.id)
+        likebuffer.unlike(self.other.id, self.recipe.id)
+        flush_like_buffer()
+        self.assertEqual(
+            list(RecipeLike.objects.values_list("user_id", flat=True)), [self.user.id]
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes_count, 1)
+        self.assertEqual(likebuffer.get_deltas([self.recipe.id]), {})
+        self.assertEqual(likebuffer.get_stats(), {"dirty_recipes": 0})
+        self.assertEqual(self.get_likes(), 1)
+        self.assertEqual(
+            sorted(RecipeLikeEvent.objects.values_list("liked", flat=True)),
+            [False, True, True],
+        )
+
+    def test_flush_resumes_after_crash_before_apply(self):
+        likebuffer.like(self.user.id, self.recipe.id)
+        likebuffer._claim(likebuffer.get_client(), self.recipe.id)
+        # Intents arriving during the interrupted flush stay pending
+        likebuffer.like(self.other.id, self.recipe.id)
+        self.assertEqual(self.get_likes(), 2)
+        self.assertEqual(likebuffer.flush(), 1)
+        self.assertEqual(likebuffer.flush(), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes_count, 2)
+        self.assertEqual(RecipeLike.objects.count(), 2)
+
+    def test_flush_resumes_after_crash_before_ack(self):
+        likebuffer.like(self.user.id, self.recipe.id)
+        intents = likebuffer._claim(likebuffer.get_client(), self.recipe.id)
+        likebuffer.apply(
+            {(user_id, self.recipe.id): liked for user_id, liked in intents.items()}
+        )
+        likebuffer.flush()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.likes_count, 1)
+        self.assertEqual(RecipeLike.objects.count(), 1)
+        self.assertEqual(self.get_likes(), 1)
+
+    def test_flush_skips_deleted_recipes(self):
+        likebuffer.like(self.user.id, self.recipe.id)
+        self.recipe.delete()
+        likebuffer.flush()
+        self.assertFalse(RecipeLike.objects.exists())
+        self.assertEqual(likebuffer.get_stats(), {"dirty_recipes": 0})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeLikeAnalyticsTests(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="strongpassword123",
+        )
+        self.fans = [
+            User.objects.create_user(
+                username=f"fan{i}",
+                email=f"fan{i}@example.com",
+                password="strongpassword123",
+            )
+            for i in range(3)
+        ]
+        category = RecipeCategory.objects.create(name="Dessert")
+        self.recipes = [
+            Recipe.objects.create(
+                title=f"Recipe {i}",
+                desc="A description",
+                cook_time="00:30:00",
+                ingredients="Sugar, Flour",
+                procedure="Mix and bake",
+                author=author,
+                category=category,
+            )
+            for i, author in enumerate([self.author, self.author, self.fans[0]])
+        ]
+        self.url = reverse("recipe:recipe-like-analytics")
+        self.today = timezone.localdate()
+        self.client.force_authenticate(user=self.author)
+
+    def like(self, user, recipe, method="post"):
+        self.client.force_authenticate(user=user)
+        url = reverse("recipe:recipe-like", kwargs={"pk": recipe.id})
+        getattr(self.client, method)(url)
+        self.client.force_authenticate(user=self.author)
+
+    def test_rollup_counts_likes_and_unlikes_per_day(self):
+        for fan in self.fans:
+            self.like(fan, self.recipes[0])
+        self.like(self.fans[0], self.recipes[0], "delete")
+        self.like(self.fans[1], self.recipes[1])
+        self.like(self.fans[1], self.recipes[2])
+        RecipeLikeEvent.objects.create(
+            recipe=self.recipes[1],
+            liked=True,
+            created=timezone.now() - timedelta(days=3),
+        )
+        with override_settings(RECIPE_LIKE_ROLLUP_BATCH_SIZE=2):
+            rollup_recipe_likes()
+        self.assertFalse(RecipeLikeEvent.objects.exists())
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (row["recipe"], row["day"], row["likes"], row["unlikes"])
+                for row in response.data["results"]
+            ],
+            [
+                (self.recipes[1].id, self.today - timedelta(days=3), 1, 0),
+                (self.recipes[0].id, self.today, 3, 1),
+                (self.recipes[1].id, self.today, 1, 0),
+            ],
+        )
+        self.assertEqual(response.data["totals"], {"likes": 5, "unlikes": 1})
+
+        # Already consumed events are not counted again
+        rollup_recipe_likes()
+        self.assertEqual(self.client.get(self.url).data["totals"]["likes"], 5)
+
+    def test_rollup_adds_to_existing_days(self):
+        self.like(self.fans[0], self.recipes[0])
+        rollup_recipe_likes()
+        self.like(self.fans[1], self.recipes[0])
+        self.like(self.fans[1], self.recipes[0], "delete")
+        rollup_recipe_likes()
+        daily = RecipeLikeDaily.objects.get()
+        self.assertEqual((daily.author, daily.likes, daily.unlikes), (self.author, 2, 1))
+
+    def test_date_range_and_recipe_filters(self):
+        days = ((0, self.recipes[0]), (5, self.recipes[0]), (5, self.recipes[1]))
+        for days_ago, recipe in days:
+            RecipeLikeDaily.objects.create(
+                author=self.author,
+                recipe=recipe,
+                day=self.today - timedelta(days=days_ago),
+                likes=1,
+            )
+        start = (self.today - timedelta(days=5)).isoformat()
+        end = (self.today - timedelta(days=1)).isoformat()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"start": start, "end": end})
+        self.assertEqual(response.data["totals"]["likes"], 2)
+        response = self.client.get(self.url, {"recipe": self.recipes[0].id})
+        self.assertEqual(response.data["totals"]["likes"], 2)
+
+    def test_invalid_ranges(self):
+        response = self.client.get(self.url, {"start": "2024-02-01", "end": "2024-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"start": "2020-01-01", "end": "2024-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"start": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipePaginationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        category = RecipeCategory.objects.create(name="Dessert")
+        self.recipes = [
+            Recipe.objects.create(
+                title=f"Recipe {i}",
+                desc="A description",
+                cook_time="00:30:00",
+                ingredients="Sugar, Flour",
+                procedure="Mix and bake",
+                author=self.user,
+                category=category,
+            )
+            for i in range(15)
+        ]
+
+    def test_page_number_pagination_is_default(self):
+        response = self.client.get(reverse("recipe:recipe-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 15)
+
+    def test_cursor_pagination_walks_feed_without_count(self):
+        warm_reference_cache()
+        url = reverse("recipe:recipe-list") + "?pagination=cursor"
+        seen = []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            seen.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        expected = [recipe.id for recipe in reversed(self.recipes)]
+        self.assertEqual(seen, expected)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeSearchTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.category = RecipeCategory.objects.create(name="Dessert")
+        self.by_ingredient = self.create_recipe(
+            "Pancakes", "Fluffy breakfast", "Flour, Milk, Chocolate chips"
+        )
+        self.by_title = self.create_recipe(
+            "Chocolate Cake", "Rich and moist", "Flour, Sugar, Cocoa"
+        )
+        self.unrelated = self.create_recipe(
+            "Tomato Soup", "Warm and hearty", "Tomatoes, Basil"
+        )
+
+    def create_recipe(self, title, desc, ingredients):
+        return Recipe.objects.create(
+            title=title,
+            desc=desc,
+            cook_time="00:30:00",
+            ingredients=ingredients,
+            procedure="Cook it",
+            author=self.user,
+            category=self.category,
+        )
+
+    def search(self, query):
+        return self.client.get(reverse("recipe:recipe-search"), {"q": query})
+
+    def test_search_ranks_title_above_ingredients(self):
+        response = self.search("chocolate")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [item["id"] for item in response.data["results"]]
+        self.assertEqual(ids, [self.by_title.id, self.by_ingredient.id])
+
+    def test_search_vector_follows_updates(self):
+        self.unrelated.title = "Chocolate Soup"
+        self.unrelated.save()
+        response = self.search("chocolate soup")
+        ids = [item["id"] for item in response.data["results"]]
+        self.assertEqual(ids, [self.unrelated.id])
+
+    def test_search_paginates_with_cursor(self):
+        for i in range(12):
+            self.create_recipe(f"Chocolate Cookie {i}", "Crunchy", "Chocolate")
+        seen = []
+        url = reverse("recipe:recipe-search") + "?q=chocolate"
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn("count", response.data)
+            seen.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(len(seen), 14)
+        self.assertEqual(len(set(seen)), 14)
+
+    def test_search_requires_query(self):
+        response = self.search(" ")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeFilterTests(APITestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user(
+            username="alice", email="alice@example.com", password="strongpassword123"
+        )
+        self.alicia = User.objects.create_user(
+            username="alicia", email="alicia@example.com", password="strongpassword123"
+        )
+        self.dessert = RecipeCategory.objects.create(name="Dessert")
+        self.desserts = RecipeCategory.objects.create(name="Desserts")
+        self.recipe_1 = self.create_recipe(self.alice, self.dessert)
+        self.recipe_2 = self.create_recipe(self.alicia, self.desserts)
+
+    def create_recipe(self, author, category):
+        return Recipe.objects.create(
+            title="Test Recipe",
+            desc="A description",
+            cook_time="00:30:00",
+            ingredients="Sugar, Flour",
+            procedure="Mix and bake",
+            author=author,
+            category=category,
+        )
+
+    def filter_ids(self, params):
+        response = self.client.get(reverse("recipe:recipe-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {item["id"] for item in response.data["results"]}
+
+    def test_contains_filters(self):
+        self.assertEqual(
+            self.filter_ids({"category_name": "dESS"}),
+            {self.recipe_1.id, self.recipe_2.id},
+        )
+        self.assertEqual(
+            self.filter_ids({"author_username": "ALI"}),
+            {self.recipe_1.id, self.recipe_2.id},
+        )
+
+    def test_exact_filters(self):
+        self.assertEqual(
+            self.filter_ids({"category_name_exact": "dessert"}), {self.recipe_1.id}
+        )
+        self.assertEqual(
+            self.filter_ids({"author_username_exact": "ALICIA"}), {self.recipe_2.id}
+        )
+        self.assertEqual(
+            self.filter_ids({"category_id": self.desserts.id}), {self.recipe_2.id}
+        )
+        self.assertEqual(self.filter_ids({"author_id": self.alice.id}), {self.recipe_1.id})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeOrderingTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.category = RecipeCategory.objects.create(name="Dessert")
+        self.recipes = [
+            Recipe.objects.create(
+                title=f"Recipe {i}",
+                desc="A description",
+                cook_time=f"00:{10 * (i % 3) + 10}:00",
+                ingredients="Sugar, Flour",
+                procedure="Mix and bake",
+                author=self.user,
+                category=self.category,
+            )
+            for i in range(7)
+        ]
+        for i, recipe in enumerate(self.recipes):
+            Recipe.objects.filter(id=recipe.id).update(likes_count=i % 4)
+        self.url = reverse("recipe:recipe-list")
+
+    def get_ids(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.data["results"]]
+
+    def expected(self, key, reverse=False):
+        recipes = sorted(
+            Recipe.objects.all(), key=lambda recipe: (key(recipe), recipe.id)
+        )
+        return [recipe.id for recipe in (recipes[::-1] if reverse else recipes)]
+
+    def test_order_by_likes_with_id_tie_break(self):
+        self.assertEqual(
+            self.get_ids({"ordering": "-likes"}),
+            self.expected(lambda recipe: recipe.likes_count, reverse=True),
+        )
+
+    def test_order_by_cook_time(self):
+        self.assertEqual(
+            self.get_ids({"ordering": "cook_time"}),
+            self.expected(lambda recipe: recipe.cook_time),
+        )
+
+    def test_unknown_ordering_falls_back_to_newest(self):
+        self.assertEqual(
+            self.get_ids({"ordering": "title"}),
+            self.expected(lambda recipe: recipe.created_at, reverse=True),
+        )
+
+    def test_cursor_pages_follow_ordering(self):
+        warm_reference_cache()
+        url = self.url + "?pagination=cursor&ordering=-likes"
+        seen = []
+        with mock.patch.object(RecipeCursorPagination, "page_size", 2):
+            while url:
+                with self.assertNumQueries(1):
+                    response = self.client.get(url)
+                seen.extend(item["id"] for item in response.data["results"])
+                url = response.data["next"]
+        self.assertEqual(
+            seen, self.expected(lambda recipe: recipe.likes_count, reverse=True)
+        )
+
+    def test_cook_time_range(self):
+        ids = self.get_ids({"cook_time_min": "00:15:00", "cook_time_max": "00:20:00"})
+        self.assertEqual(
+            sorted(ids),
+            sorted(r.id for r in self.recipes if str(r.cook_time) == "00:20:00"),
+        )
+
+    def test_created_range(self):
+        cutoff = timezone.now()
+        Recipe.objects.filter(id=self.recipes[0].id).update(
+            created_at=cutoff - timedelta(days=2)
+        )
+        after = self.get_ids({"created_after": (cutoff - timedelta(days=1)).isoformat()})
+        before = self.get_ids({"created_before": (cutoff - timedelta(days=1)).isoformat()})
+        self.assertNotIn(self.recipes[0].id, after)
+        self.assertEqual(before, [self.recipes[0].id])
+
+    def test_orderings_use_an_index_without_sort(self):
+        # The test table is tiny, make the planner pick an index when it can
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_bitmapscan = off")
+        for ordering in (
+            ("-likes_count", "-id"),
+            ("bookmarks_count", "id"),
+            ("cook_time", "id"),
+            ("-created_at", "-id"),
+        ):
+            plan = Recipe.objects.order_by(*ordering)[:20].explain()
+            self.assertNotIn("Sort", plan, ordering)
+        plan = (
+            Recipe.objects.filter(cook_time__lte="00:30:00")
+            .order_by("cook_time", "id")[:20]
+            .explain()
+        )
+        self.assertNotIn("Sort", plan)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RECIPE_CACHE_ENABLED=True)
+class RecipeCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.category = RecipeCategory.objects.create(name="Dessert")
+        self.recipe = Recipe.objects.create(
+            title="Test Recipe",
+            desc="A description of the test recipe",
+            cook_time="00:30:00",
+            ingredients="Sugar, Flour",
+            procedure="Mix and bake",
+            author=self.user,
+            category=self.category,
+        )
+        self.detail_url = reverse("recipe:recipe-detail", kwargs={"pk": self.recipe.id})
+
+    def test_anonymous_list_is_served_from_cache(self):
+        self.client.get(reverse("recipe:recipe-list"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("recipe:recipe-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["id"], self.recipe.id)
+        self.assertEqual(recipe_cache.get_stats()["hits"], 1)
+        self.assertEqual(recipe_cache.get_stats()["misses"], 1)
+
+    def test_list_cache_is_keyed_by_query_params(self):
+        self.client.get(reverse("recipe:recipe-list"))
+        response = self.client.get(
+            reverse("recipe:recipe-list"), {"category_name": "soup"}
+        )
+        self.assertEqual(response.data["count"], 0)
+
+    def test_like_invalidates_cached_detail(self):
+        self.assertEqual(self.client.get(self.detail_url).data["total_number_of_likes"], 0)
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse("recipe:recipe-like", kwargs={"pk": self.recipe.id}))
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.detail_url).data["total_number_of_likes"], 1)
+
+    def test_bookmark_invalidates_cached_list(self):
+        self.client.get(reverse("recipe:recipe-list"))
+        self.client.force_authenticate(user=self.user)
+        self.client.post(
+            reverse("users:user-bookmark", kwargs={"pk": self.user.id}),
+            {"id": self.recipe.id},
+            format="json",
+        )
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse("recipe:recipe-list"))
+        self.assertEqual(response.data["results"][0]["total_number_of_bookmarks"], 1)
+
+    def test_recipe_save_invalidates_only_its_detail(self):
+        other = Recipe.objects.create(
+            title="Other Recipe",
+            desc="Another description",
+            cook_time="00:10:00",
+            ingredients="Salt",
+            procedure="Boil",
+            author=self.user,
+            category=self.category,
+        )
+        other_url = reverse("recipe:recipe-detail", kwargs={"pk": other.id})
+        self.client.get(self.detail_url)
+        self.client.get(other_url)
+        self.recipe.title = "Renamed Recipe"
+        self.recipe.save()
+        self.assertEqual(self.client.get(self.detail_url).data["title"], "Renamed Recipe")
+        with self.assertNumQueries(0):
+            self.client.get(other_url)
+
+    def test_username_change_invalidates_cached_responses(self):
+        self.client.get(self.detail_url)
+        self.user.username = "renamed"
+        self.user.save()
+        self.assertEqual(self.client.get(self.detail_url).data["username"], "renamed")
+
+    def test_username_change_does_not_cache_stale_local_names(self):
+        self.client.get(self.detail_url)
+        self.user.username = "renamed"
+        self.user.save()
+        # Another process still has the old name in its local tier
+        refcache.usernames._set_local({self.user.id: "testuser"})
+        self.assertEqual(self.client.get(self.detail_url).data["username"], "testuser")
+        refcache.usernames.clear_local()
+        self.assertEqual(self.client.get(self.detail_url).data["username"], "renamed")
+
+    def test_responses_are_cached_again_after_rename_settled(self):
+        self.category.name = "Desserts"
+        self.category.save()
+        self.client.get(self.detail_url)
+        self.assertEqual(recipe_cache.get_stats()["misses"], 0)
+        cache.delete(recipe_cache.SETTLING_KEY)
+        self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["category_name"], "Desserts")
+
+    def test_sync_recipe_counters_invalidates_repaired_recipes(self):
+        self.assertEqual(self.client.get(self.detail_url).data["total_number_of_likes"], 0)
+        RecipeLike.objects.create(user=self.user, recipe=self.recipe)
+        call_command("sync_recipe_counters", stdout=StringIO())
+        self.assertEqual(self.client.get(self.detail_url).data["total_number_of_likes"], 1)
+
+    def test_user_save_keeps_cached_responses(self):
+        self.client.get(self.detail_url)
+        self.user.first_name = "Test"
+        self.user.save()
+        with self.assertNumQueries(0):
+            self.client.get(self.detail_url)
+
+    def test_recipe_delete_skips_like_rows(self):
+        RecipeLike.objects.like(self.user.id, self.recipe.id)
+        with CaptureQueriesContext(connection) as queries:
+            self.recipe.delete()
+        self.assertFalse(any(
+            query["sql"].startswith('SELECT "recipe_recipelike"') for query in queries))
+
+    @override_settings(RECIPE_CACHE_ENABLED=False)
+    def test_cache_can_be_disabled(self):
+        self.client.get(reverse("recipe:recipe-list"))
+        with self.assertNumQueries(2):
+            self.client.get(reverse("recipe:recipe-list"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.category = RecipeCategory.objects.create(name="Dessert")
+        self.recipe = Recipe.objects.create(
+            title="Test Recipe",
+            desc="A description of the test recipe",
+            cook_time="00:30:00",
+            ingredients="Sugar, Flour",
+            procedure="Mix and bake",
+            author=self.user,
+            category=self.category,
+        )
+        self.detail_url = reverse("recipe:recipe-detail", kwargs={"pk": self.recipe.id})
+
+    def test_retrieve_sets_etag_only(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertNotIn("Last-Modified", response)
+
+    def test_retrieve_not_modified_with_single_query(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since_is_ignored(self):
+        # A rename changes the response without touching updated_at
+        self.client.get(self.detail_url)
+        self.user.username = "renamed"
+        self.user.save()
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["username"], "renamed")
+
+    def test_like_changes_etag(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        self.client.post(reverse("recipe:recipe-like", kwargs={"pk": self.recipe.id}))
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_number_of_likes"], 1)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_author_rename_changes_etag(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        self.user.username = "renamed"
+        self.user.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["username"], "renamed")
+
+    def test_category_rename_changes_etag(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        self.category.name = "Desserts"
+        self.category.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["category_name"], "Desserts")
+
+    def test_list_has_no_last_modified(self):
+        response = self.client.get(reverse("recipe:recipe-list"))
+        self.assertIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+    def test_list_not_modified_until_new_recipe(self):
+        url = reverse("recipe:recipe-list")
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        Recipe.objects.create(
+            title="New Recipe",
+            desc="Another description",
+            cook_time="00:10:00",
+            ingredients="Salt",
+            procedure="Boil",
+            author=self.user,
+            category=self.category,
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+
+    @override_settings(RECIPE_CACHE_ENABLED=True)
+    def test_cached_anonymous_read_answers_without_queries(self):
+        cache.clear()
+        self.client.force_authenticate(user=None)
+        etag = self.client.get(self.detail_url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeSparseFieldsTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = Recipe.objects.create(
+            title="Test Recipe",
+            desc="A description of the test recipe",
+            cook_time="00:30:00",
+            ingredients="Sugar, Flour",
+            procedure="Mix and bake",
+            author=self.user,
+            category=RecipeCategory.objects.create(name="Dessert"),
+        )
+
+    def get_list(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("recipe:recipe-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"][0], queries[-1]["sql"]
+
+    def test_list_is_compact_by_default(self):
+        item, sql = self.get_list()
+        self.assertNotIn("ingredients", item)
+        self.assertNotIn("procedure", item)
+        self.assertEqual(item["username"], "testuser")
+        self.assertNotIn('"ingredients"', sql)
+        self.assertNotIn('"procedure"', sql)
+
+    def test_list_fields_selects_and_defers(self):
+        item, sql = self.get_list({"fields": "id,title,ingredients"})
+        self.assertEqual(set(item), {"id", "title", "ingredients"})
+        self.assertIn('"ingredients"', sql)
+        self.assertNotIn('"desc"', sql)
+        self.assertNotIn("JOIN", sql)
+
+    def test_list_omit_drops_fields(self):
+        item, sql = self.get_list({"omit": "username,total_number_of_likes"})
+        self.assertNotIn("username", item)
+        self.assertNotIn("total_number_of_likes", item)
+        self.assertIn("category_name", item)
+        self.assertNotIn("users_customuser", sql)
+
+    def test_empty_selection_matches_retrieve(self):
+        url = reverse("recipe:recipe-detail", kwargs={"pk": self.recipe.id})
+        for params in ({"fields": "bogus"}, {"omit": ",".join(RecipeSerializer.Meta.fields
+                                                    + RecipeSerializer.Meta.viewer_fields)}):
+            item, _ = self.get_list(params)
+            self.assertEqual(item, {})
+            self.assertEqual(self.client.get(url, params).data, {})
+
+    def test_retrieve_is_full_by_default(self):
+        url = reverse("recipe:recipe-detail", kwargs={"pk": self.recipe.id})
+        response = self.client.get(url)
+        self.assertEqual(response.data["ingredients"], "Sugar, Flour")
+        response = self.client.get(url, {"fields": "id,procedure"})
+        self.assertEqual(set(response.data), {"id", "procedure"})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeReadSerializerTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        category = RecipeCategory.objects.create(name="Dessert")
+        for picture in ("uploads/cake.jpg", ""):
+            Recipe.objects.create(
+                title="Test Recipe",
+                desc="A description of the test recipe",
+                cook_time="00:30:00",
+                ingredients="Sugar, Flour",
+                procedure="Mix and bake",
+                picture=picture,
+                author=self.user,
+                category=category,
+            )
+        self.context = {"request": APIRequestFactory().get("/api/recipe/")}
+
+    def assert_same_output(self, fields):
+        expected = RecipeSerializer(
+            Recipe.objects.with_related(),
+            many=True,
+            fields=fields,
+            context=self.context,
+        ).data
+        reader = RecipeReadSerializer(fields, self.context)
+        actual = reader.serialize(
+            Recipe.objects.values(*reader.get_value_fields())
+        )
+        self.assertEqual(
+            JSONRenderer().render(actual), JSONRenderer().render(expected)
+        )
+
+    def test_matches_recipe_serializer(self):
+        self.assert_same_output(RecipeSerializer.Meta.fields)
+
+    def test_matches_recipe_serializer_with_sparse_fields(self):
+        self.assert_same_output(("id", "category", "picture", "username"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeImportTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.dessert = RecipeCategory.objects.create(name="Dessert")
+
+    def build_row(self, title, category="Dessert", **extra):
+        row = {
+            "title": title,
+            "desc": "Imported recipe",
+            "cook_time": "00:45:00",
+            "ingredients": "Flour, Sugar",
+            "procedure": "Mix and bake",
+            "category": {"name": category},
+        }
+        row.update(extra)
+        return row
+
+    def post_import(self, body, content_type="application/x-ndjson", **params):
+        url = reverse("recipe:recipe-import")
+        if params:
+            url += "?" + "&".join(f"{key}={value}" for key, value in params.items())
+        return self.client.post(url, data=body, content_type=content_type)
+
+    def test_import_ndjson_reports_invalid_rows(self):
+        body = "\n".join(
+            [
+                json.dumps(self.build_row("Brownies")),
+                json.dumps(self.build_row("No cook time", cook_time="soon")),
+                "{not json",
+                json.dumps(self.build_row("Gazpacho", category="Soup")),
+            ]
+        )
+        # Category lookup and insert, then within a savepoint one recipe
+        # INSERT and the ingredient index: ingredient lookup, insert and
+        # re-read, links insert and counts update.
+        with self.assertNumQueries(10):
+            response = self.post_import(body)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["failed"], 2)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [2, 3])
+        self.assertEqual(
+            Recipe.objects.get(title="Brownies").category_id, self.dessert.id
+        )
+        self.assertEqual(Recipe.objects.get(title="Gazpacho").category.name, "Soup")
+        self.assertEqual(Recipe.objects.get(title="Gazpacho").author, self.user)
+
+    def test_import_json_array_in_small_reads_and_batches(self):
+        rows = [self.build_row(f"Cake {i}") for i in range(25)]
+        with mock.patch("recipe.importers.READ_SIZE", 7):
+            response = self.post_import(
+                json.dumps(rows), content_type="application/json", batch_size=10
+            )
+        self.assertEqual(response.data["created"], 25)
+        self.assertEqual(Recipe.objects.filter(title__startswith="Cake").count(), 25)
+        search = self.client.get(reverse("recipe:recipe-search"), {"q": "cake"})
+        self.assertEqual(len(search.data["results"]), 10)
+
+    def test_import_truncated_json_array(self):
+        body = json.dumps([self.build_row("Cake")])[:-10]
+        response = self.post_import(body, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_unauthenticated(self):
+        self.client.logout()
+        response = self.post_import(json.dumps(self.build_row("Cake")))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_import_recipes_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as f:
+            for i in range(3):
+                f.write(json.dumps(self.build_row(f"Pie {i}")) + "\n")
+            f.flush()
+            call_command(
+                "import_recipes", f.name, "--author", self.user.email, stdout=StringIO()
+            )
+        self.assertEqual(Recipe.objects.filter(author=self.user).count(), 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeBatchTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.category = RecipeCategory.objects.create(name="Dessert")
+        self.recipes = [
+            Recipe.objects.create(
+                title=f"Recipe {i}",
+                desc="A description of the test recipe",
+                cook_time="00:30:00",
+                ingredients="Sugar, Flour",
+                procedure="Mix and bake",
+                author=self.user,
+                category=self.category,
+            )
+            for i in range(3)
+        ]
+        self.url = reverse("recipe:recipe-batch")
+
+    def get_batch(self, ids, **extra):
+        return self.client.get(
+            self.url, {"ids": ",".join(str(pk) for pk in ids)}, **extra
+        )
+
+    def test_batch_preserves_order_and_reports_missing(self):
+        first, second, third = (recipe.id for recipe in self.recipes)
+        response = self.get_batch([third, 999999, first, third])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data["results"]], [third, first]
+        )
+        self.assertEqual(response.data["missing"], [999999])
+
+    def test_batch_matches_retrieve(self):
+        recipe = self.recipes[0]
+        response = self.get_batch([recipe.id])
+        detail = self.client.get(
+            reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+        )
+        self.assertEqual(
+            json.loads(json.dumps(response.data["results"][0])),
+            json.loads(detail.content),
+        )
+
+    def test_batch_constant_queries(self):
+        warm_reference_cache()
+        ids = [recipe.id for recipe in self.recipes]
+        with self.assertNumQueries(1):
+            response = self.get_batch(ids)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_batch_sparse_fields(self):
+        response = self.client.get(
+            self.url, {"ids": str(self.recipes[0].id), "fields": "id,title"}
+        )
+        self.assertEqual(set(response.data["results"][0]), {"id", "title"})
+
+    def test_batch_invalid_ids(self):
+        for ids in ("", "1,abc", "-1", "²"):
+            response = self.client.get(self.url, {"ids": ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_BATCH_MAX_IDS=2)
+    def test_batch_too_many_ids(self):
+        response = self.get_batch([recipe.id for recipe in self.recipes])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_not_modified_until_recipe_changes(self):
+        ids = [recipe.id for recipe in self.recipes]
+        etag = self.get_batch(ids)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.get_batch(ids, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.post(
+            reverse("recipe:recipe-like", kwargs={"pk": self.recipes[1].id})
+        )
+        response = self.get_batch(ids, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][1]["total_number_of_likes"], 1)
+
+    @override_settings(RECIPE_CACHE_ENABLED=True)
+    def test_batch_cached_for_anonymous_reads(self):
+        cache.clear()
+        self.client.force_authenticate(user=None)
+        ids = [recipe.id for recipe in self.recipes]
+        self.get_batch(ids)
+        with self.assertNumQueries(0):
+            response = self.get_batch(ids)
+        self.assertEqual(len(response.data["results"]), 3)
+        Recipe.objects.filter(id=ids[0]).update(title="Renamed")
+        recipe_cache.invalidate_recipe(ids[0])
+        response = self.get_batch(ids)
+        self.assertEqual(response.data["results"][0]["title"], "Renamed")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeExportTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.dessert = RecipeCategory.objects.create(name="Dessert")
+        self.soup = RecipeCategory.objects.create(name="Soup")
+        self.recipes = [
+            Recipe.objects.create(
+                title=f"Recipe {i}",
+                desc="A description of the test recipe",
+                cook_time="00:30:00",
+                ingredients="Sugar, Flour",
+                procedure="Mix and bake",
+                author=self.user,
+                category=self.dessert if i % 2 else self.soup,
+            )
+            for i in range(4)
+        ]
+        self.url = reverse("recipe:recipe-export")
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        body = b"".join(response.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_export_streams_all_recipes_in_update_order(self):
+        lines = self.export()
+        self.assertEqual(
+            [line["id"] for line in lines], [recipe.id for recipe in self.recipes]
+        )
+        self.assertIn("ingredients", lines[0])
+        self.assertIn("updated_at", lines[0])
+
+    def test_export_applies_recipe_filter(self):
+        lines = self.export(category_name_exact="dessert")
+        self.assertEqual({line["category_name"] for line in lines}, {"Dessert"})
+        self.assertEqual(len(lines), 2)
+
+    def test_export_resumes_after_last_line(self):
+        lines = self.export()
+        resumed = self.export(since=lines[1]["updated_at"], since_id=lines[1]["id"])
+        self.assertEqual(
+            [line["id"] for line in resumed], [line["id"] for line in lines[2:]]
+        )
+
+    def test_export_includes_recipes_updated_since(self):
+        lines = self.export()
+        recipe = self.recipes[0]
+        recipe.title = "Renamed"
+        recipe.save()
+        resumed = self.export(since=lines[-1]["updated_at"], since_id=lines[-1]["id"])
+        self.assertEqual([line["title"] for line in resumed], ["Renamed"])
+
+    def test_export_invalid_since(self):
+        response = self.client.get(self.url, {"since": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_unauthenticated(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_recipes_command(self):
+        out = StringIO()
+        call_command(
+            "export_recipes", "--filter", "category_name_exact=soup",
+            "--chunk-size", "1", stdout=out, stderr=StringIO(),
+        )
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual({line["category_name"] for line in lines}, {"Soup"})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeTrendingTests(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="strongpassword123",
+        )
+        self.fans = [
+            User.objects.create_user(
+                username=f"fan{i}",
+                email=f"fan{i}@example.com",
+                password="strongpassword123",
+            )
+            for i in range(3)
+        ]
+        self.category = RecipeCategory.objects.create(name="Dessert")
+        self.old, self.fresh, self.quiet = (
+            Recipe.objects.create(
+                title=title,
+                desc="A description of the test recipe",
+                cook_time="00:30:00",
+                ingredients="Sugar, Flour",
+                procedure="Mix and bake",
+                author=self.author,
+                category=self.category,
+            )
+            for title in ("Old", "Fresh", "Quiet")
+        )
+        self.url = reverse("recipe:recipe-trending")
+
+    def like(self, recipe, user, age):
+        like = RecipeLike.objects.create(user=user, recipe=recipe)
+        RecipeLike.objects.filter(id=like.id).update(created=timezone.now() - age)
+
+    def test_recent_likes_outrank_older_likes(self):
+        for fan in self.fans:
+            self.like(self.old, fan, timedelta(days=3))
+        self.like(self.fresh, self.fans[0], timedelta(minutes=5))
+        self.like(self.fresh, self.fans[1], timedelta(minutes=5))
+        refresh_trending_scores()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data["results"]],
+            [self.fresh.id, self.old.id],
+        )
+
+    def test_bookmarks_count_towards_score(self):
+        Profile.objects.add_bookmarks(self.fans[0].id, [self.quiet.id])
+        refresh_trending_scores()
+        self.quiet.refresh_from_db()
+        self.assertGreater(self.quiet.trending_score, 0)
+
+    def test_bookmarks_decay_by_their_own_age(self):
+        # Old recipes bookmarked recently trend, old bookmarks do not
+        Recipe.objects.filter(id=self.old.id).update(
+            created_at=timezone.now() - timedelta(days=30))
+        Profile.objects.add_bookmarks(self.fans[0].id, [self.old.id, self.quiet.id])
+        Bookmark.objects.filter(recipe=self.quiet).update(
+            created_at=timezone.now() - timedelta(days=30))
+        refresh_trending_scores()
+        self.assertEqual(
+            [recipe["id"] for recipe in self.client.get(self.url).data["results"]],
+            [self.old.id],
+        )
+
+    def test_likes_outside_window_reset_score(self):
+        self.like(self.old, self.fans[0], timedelta(hours=1))
+        refresh_trending_scores()
+        RecipeLike.objects.update(created=timezone.now() - timedelta(days=30))
+        refresh_trending_scores()
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.trending_score, 0)
+        self.assertEqual(self.client.get(self.url).data["results"], [])
+
+    def test_refresh_only_touches_active_recipes(self):
+        self.like(self.fresh, self.fans[0], timedelta(minutes=5))
+        self.assertEqual(Recipe.objects.refresh_trending_scores(), 1)
+
+    def test_trending_single_query(self):
+        self.like(self.fresh, self.fans[0], timedelta(minutes=5))
+        refresh_trending_scores()
+        warm_reference_cache()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data["results"]), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeIngredientIndexTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.category = RecipeCategory.objects.create(name="Dessert")
+        self.pancakes = self.create_recipe("Pancakes", "2 cups flour, 2 eggs, 1 cup milk")
+        self.omelette = self.create_recipe("Omelette", "3 Eggs\n1 tsp salt")
+        self.cake = self.create_recipe("Cake", "flour, eggs, sugar, butter")
+        self.url = reverse("recipe:recipe-cook")
+
+    def create_recipe(self, title, ingredients):
+        return Recipe.objects.create(
+            title=title,
+            desc="A description of the test recipe",
+            cook_time="00:30:00",
+            ingredients=ingredients,
+            procedure="Mix and cook",
+            author=self.user,
+            category=self.category,
+        )
+
+    def test_parse_ingredients(self):
+        self.assertEqual(
+            parse_ingredients(
+                "2 cups Plain Flour (sifted), 3 eggs; 1 tsp salt\n½ lb Tomatoes, molasses"
+            ),
+            ["egg", "molasses", "plain flour", "salt", "tomato"],
+        )
+
+    def test_save_indexes_ingredients(self):
+        self.assertEqual(
+            set(self.pancakes.ingredient_links.values_list("ingredient__name", flat=True)),
+            {"flour", "egg", "milk"},
+        )
+        self.pancakes.ingredients = "flour, water"
+        self.pancakes.save()
+        self.pancakes.refresh_from_db()
+        self.assertEqual(self.pancakes.ingredient_count, 2)
+        self.assertEqual(
+            set(self.pancakes.ingredient_links.values_list("ingredient__name", flat=True)),
+            {"flour", "water"},
+        )
+
+    def test_cook_ranks_by_coverage(self):
+        response = self.client.get(self.url, {"ingredients": "eggs, flour, milk"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(
+            [recipe["id"] for recipe in results],
+            [self.pancakes.id, self.cake.id, self.omelette.id],
+        )
+        self.assertEqual(results[0]["coverage"], 1.0)
+        self.assertEqual(results[1]["matched_ingredients"], 2)
+        self.assertEqual(results[1]["coverage"], 0.5)
+
+    def test_cook_max_missing(self):
+        response = self.client.get(
+            self.url, {"ingredients": "eggs, flour, milk", "max_missing": "0"}
+        )
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data["results"]], [self.pancakes.id]
+        )
+
+    def test_cook_filters_apply_before_ranking(self):
+        mains = RecipeCategory.objects.create(name="Main")
+        Recipe.objects.filter(id__in=[self.pancakes.id, self.omelette.id]).update(
+            category=mains)
+        warm_reference_cache()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.url, {"ingredients": "eggs", "category_id": self.category.id})
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data["results"]], [self.cake.id])
+        # Postings are counted by one join, not by a subquery per recipe
+        self.assertIn('COUNT("recipe_recipeingredient"."id")', queries[-1]["sql"])
+        self.assertIn('"recipe_recipe"."category_id" =', queries[-1]["sql"])
+
+    def test_cook_pages_cover_every_match(self):
+        for i in range(12):
+            self.create_recipe(f"Scramble {i}", "eggs, butter")
+        ids, params = [], {"ingredients": "eggs"}
+        url = self.url
+        while url:
+            response = self.client.get(url, params)
+            ids += [recipe["id"] for recipe in response.data["results"]]
+            url, params = response.data["next"], None
+        self.assertEqual(len(ids), 15)
+        self.assertEqual(len(set(ids)), 15)
+
+    def test_cook_constant_queries(self):
+        warm_reference_cache()
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"ingredients": "eggs, salt"})
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_cook_unknown_ingredients(self):
+        response = self.client.get(self.url, {"ingredients": "dragon fruit"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+
+    def test_cook_requires_ingredients(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for value in ("x", "-1", "²"):
+            response = self.client.get(self.url, {"ingredients": "egg", "max_missing": value})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_imported_recipes_are_indexed(self):
+        row = {
+            "title": "Crepes",
+            "desc": "Imported recipe",
+            "cook_time": "00:20:00",
+            "ingredients": "flour, eggs, milk",
+            "procedure": "Mix and fry",
+            "category": {"name": "Dessert"},
+        }
+        self.client.post(
+            reverse("recipe:recipe-import"),
+            data=json.dumps(row),
+            content_type="application/x-ndjson",
+        )
+        crepes = Recipe.objects.get(title="Crepes")
+        self.assertEqual(crepes.ingredient_count, 3)
+
+    def test_index_recipe_ingredients_command(self):
+        RecipeIngredient.objects.all().delete()
+        Recipe.objects.update(ingredient_count=0)
+        call_command("index_recipe_ingredients", "--batch-size", "2", stdout=StringIO())
+        self.assertEqual(RecipeIngredient.objects.count(), 9)
+        self.cake.refresh_from_db()
+        self.assertEqual(self.cake.ingredient_count, 4)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeReferenceCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        for reference_cache in refcache.reference_caches:
+            reference_cache.clear_local()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="strongpassword123",
+        )
+        self.category = RecipeCategory.objects.create(name="Dessert")
+
+    def test_two_tiers(self):
+        loads = []
+
+        def load_many(keys):
+            loads.append(keys)
+            return {key: key * 2 for key in keys if key != 0}
+
+        two_tier = refcache.TwoTierCache("test", load_many, maxsize=2, ttl=60)
+        self.assertEqual(two_tier.get_many([1, 2, 0]), {1: 2, 2: 4})
+        self.assertEqual(loads, [[1, 2, 0]])
+        self.assertEqual(two_tier.get(1), 2)
+        two_tier.clear_local()
+        # Served by the shared tier, only the unknown key is loaded again
+        self.assertEqual(two_tier.get_many([1, 2, 0]), {1: 2, 2: 4})
+        self.assertEqual(loads[1:], [[0]])
+        stats = two_tier.get_stats()
+        self.assertEqual(
+            (stats["local_hits"], stats["shared_hits"], stats["misses"]), (1, 2, 4)
+        )
+        self.assertAlmostEqual(stats["hit_ratio"], 3 / 7)
+
+    def test_local_tier_is_lru_bounded(self):
+        two_tier = refcache.TwoTierCache("test", lambda keys: {k: k for k in keys},
+                                         maxsize=2, ttl=60)
+        two_tier.get_many([1, 2])
+        two_tier.get(1)
+        two_tier.get(3)
+        self.assertEqual(list(two_tier._local), [1, 3])
+
+    def test_get_category_skips_queries_when_cached(self):
+        refcache.get_category("Dessert")
+        with self.assertNumQueries(0):
+            category = refcache.get_category("Dessert")
+        self.assertEqual(category.id, self.category.id)
+
+    def test_category_rename_invalidates(self):
+        self.assertEqual(refcache.category_names.get(self.category.id), "Dessert")
+        self.assertEqual(refcache.get_category("Dessert").id, self.category.id)
+        self.category.name = "Sweets"
+        self.category.save()
+        self.assertEqual(refcache.category_names.get(self.category.id), "Sweets")
+        self.assertNotEqual(refcache.get_category("Dessert").id, self.category.id)
+
+    def test_username_change_invalidates(self):
+        self.assertEqual(refcache.usernames.get(self.user.id), "testuser")
+        self.user.username = "renamed"
+        self.user.save()
+        self.assertEqual(refcache.usernames.get(self.user.id), "renamed")
+
+    def test_create_recipe_reuses_cached_category(self):
+        refcache.get_category("Dessert")
+        validated_data = {
+            "title": "Cake",
+            "desc": "A cake",
+            "cook_time": "00:30:00",
+            "ingredients": "Sugar, Flour",
+            "procedure": "Bake",
+            "picture": "uploads/cake.jpg",
+            "author": self.user,
+            "category": {"name": "Dessert"},
+        }
+        with CaptureQueriesContext(connection) as queries:
+            recipe = RecipeSerializer().create(validated_data)
+        self.assertFalse(
+            any('"recipe_recipecategory"' in query["sql"] for query in queries)
+        )
+        self.assertEqual(recipe.category_id, self.category.id)
+
+    def test_reference_cache_stats_command(self):
+        out = StringIO()
+        call_command("reference_cache_stats", "--reset", stdout=out)
+        self.assertIn("category_name:", out.getvalue())
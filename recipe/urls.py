@@ -16,5 +16,16 @@ urlpatterns = [
     path(
         "create/", views.RecipeViewSet.as_view({"post": "create"}), name="recipe-create"
     ),
+    path("batch/", views.RecipeViewSet.as_view({"get": "batch"}), name="recipe-batch"),
+    path("export/", views.RecipeExportAPIView.as_view(), name="recipe-export"),
+    path("import/", views.RecipeImportAPIView.as_view(), name="recipe-import"),
+    path("trending/", views.RecipeTrendingAPIView.as_view(), name="recipe-trending"),
+    path("cook/", views.RecipeCookAPIView.as_view(), name="recipe-cook"),
+    path("search/", views.RecipeSearchAPIView.as_view(), name="recipe-search"),
+    path(
+        "analytics/likes/",
+        views.RecipeLikeAnalyticsAPIView.as_view(),
+        name="recipe-like-analytics",
+    ),
     path("<int:pk>/like/", views.RecipeLikeAPIView.as_view(), name="recipe-like"),
 ]
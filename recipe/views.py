@@ -1,44 +1,120 @@
 from rest_framework import generics, status, viewsets
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .models import Recipe, RecipeLike
-from .serializers import RecipeLikeSerializer, RecipeSerializer
+from . import cache as recipe_cache
+from . import likebuffer
+from .exporters import RecipeExporter, parse_since
+from .importers import RecipeImporter, iter_records
+from .ingredients import parse_ingredients
+from .models import Ingredient, Recipe, RecipeLike, RecipeLikeDaily
+from .serializers import (
+    RecipeLikeAnalyticsQuerySerializer,
+    RecipeLikeSerializer,
+    RecipeSerializer,
+)
+from .mixins import ConditionalReadMixin, FastListMixin, SparseFieldsMixin
+from .pagination import (
+    PaginationModeMixin,
+    RecipeCoveragePagination,
+    RecipeSearchPagination,
+    RecipeTrendingPagination,
+)
 from .permissions import IsAuthorOrReadOnly
 from .filter import *
 
+import io
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalReadMixin,
+    FastListMixin,
+    SparseFieldsMixin,
+    PaginationModeMixin,
+    viewsets.ModelViewSet,
+):
     """
-    list: Get a collection of recipes
+    list: Get a collection of recipes (`?pagination=cursor` for keyset pages,
+          `?ordering=-likes|-bookmarks|cook_time|-created`, `?cook_time_max=`,
+          `?created_after=` and other range filters, `?fields=`/`?omit=` to
+          choose fields, compact cards by default)
     create: Create a recipe
-    retrieve: Get a single recipe
+    retrieve: Get a single recipe (`?fields=`/`?omit=` to choose fields)
+    batch: Get several recipes by id in request order (`?ids=1,2,3`,
+           `?fields=`/`?omit=` to choose fields), reporting missing ids
     update: Update a recipe
     destroy: Delete a recipe
     """
 
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.with_related()
     serializer_class = RecipeSerializer
-    filter_backends = (filters.DjangoFilterBackend,)
+    filter_backends = (filters.DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    ordering = ("-created_at", "-id")
+    sparse_actions = ("list", "retrieve", "batch")
 
     def get_permissions(self):
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "batch"]:
             return [AllowAny()]
         elif self.action == "create":
             return [IsAuthenticated()]
         else:
             return [IsAuthorOrReadOnly()]
 
+    def get_queryset(self):
+        return self.trim_queryset(super().get_queryset())
+
+    def get_validator_objects(self):
+        queryset = Recipe.objects.only(*self.validator_fields)
+        if self.action == "retrieve":
+            return list(queryset.filter(pk=self.kwargs["pk"]))
+        if self.action == "batch":
+            recipes = {recipe.id: recipe for recipe in queryset.filter(pk__in=self.ids)}
+            return [recipes[pk] for pk in self.ids if pk in recipes]
+        return self.paginate_queryset(self.filter_queryset(queryset))
+
+    def get_requested_ids(self):
+        """
+        Returns the unique ids of `?ids=` in request order, or None with the
+        validation errors.
+        """
+        ids = []
+        for value in self.request.query_params.get("ids", "").split(","):
+            value = value.strip()
+            if not value:
+                continue
+            # str.isdigit() alone accepts digits int() rejects, such as "²"
+            if not (value.isascii() and value.isdigit()):
+                return None, {"ids": [f"Invalid id: {value}."]}
+            ids.append(int(value))
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return None, {"ids": ["This query parameter is required."]}
+        if len(ids) > settings.RECIPE_BATCH_MAX_IDS:
+            return None, {
+                "ids": [f"At most {settings.RECIPE_BATCH_MAX_IDS} ids are allowed."]
+            }
+        return ids, None
+
     def list(self, request, *args, **kwargs):
         try:
             logger.debug("Enter get list of recipes")
-            response = super().list(request, *args, **kwargs)
+            response = self.get_read_response(
+                lambda: recipe_cache.list_key(request),
+                super().list,
+                request,
+                *args,
+                **kwargs,
+            )
             logger.debug("Exit get list of recipes: success")
             return response
         except Exception as e:
@@ -61,7 +137,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         try:
             logger.debug(f'Enter get recipe detail: {self.kwargs["pk"]}')
-            response = super().retrieve(request, *args, **kwargs)
+            response = self.get_read_response(
+                lambda: recipe_cache.detail_key(request, self.kwargs["pk"]),
+                super().retrieve,
+                request,
+                *args,
+                **kwargs,
+            )
             logger.debug(f'Exit get recipe detail: {self.kwargs["pk"]}: success')
             return response
         except Exception as e:
@@ -70,6 +152,35 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
             return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def batch(self, request, *args, **kwargs):
+        try:
+            logger.debug("Enter get batch of recipes")
+            self.ids, errors = self.get_requested_ids()
+            if errors:
+                logger.debug("Exit get batch of recipes: invalid ids")
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            response = self.get_read_response(
+                lambda: recipe_cache.batch_key(request, self.ids),
+                self.get_batch_response,
+            )
+            logger.debug("Exit get batch of recipes: success")
+            return response
+        except Exception as e:
+            logger.error(f"Error get batch of recipes: {e}", exc_info=True)
+            return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def get_batch_response(self):
+        reader = self.get_reader()
+        rows = self.get_rows(self.get_queryset().filter(pk__in=self.ids), reader)
+        rows = {row["id"]: row for row in rows}
+        self.served_objects = [rows[pk] for pk in self.ids if pk in rows]
+        return Response(
+            {
+                "results": reader.serialize(self.served_objects),
+                "missing": [pk for pk in self.ids if pk not in rows],
+            }
+        )
+
     def update(self, request, *args, **kwargs):
         try:
             logger.debug(f'Enter update recipe detail: {self.kwargs["pk"]}')
@@ -95,6 +206,262 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class RecipeSearchAPIView(FastListMixin, SparseFieldsMixin, generics.ListAPIView):
+    """
+    Full-text search over recipe title, description and ingredients,
+    ranked by relevance (`?q=`, `?fields=`/`?omit=` to choose fields)
+    """
+
+    serializer_class = RecipeSerializer
+    permission_classes = (AllowAny,)
+    pagination_class = RecipeSearchPagination
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_class = RecipeFilter
+
+    def get_queryset(self):
+        query = SearchQuery(
+            self.request.query_params["q"], config="english", search_type="websearch"
+        )
+        # Cast to double precision so the rank round-trips exactly through
+        # the pagination cursor.
+        rank = Cast(SearchRank(F("search_vector"), query), FloatField())
+        queryset = (
+            Recipe.objects.with_related()
+            .filter(search_vector=query)
+            .annotate(rank=rank)
+        )
+        return self.trim_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        try:
+            query = request.query_params.get("q", "").strip()
+            logger.debug(f"Enter search recipes : {query}")
+            if not query:
+                logger.debug("Exit search recipes : missing query")
+                return Response(
+                    {"q": ["This query parameter is required."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            response = super().list(request, *args, **kwargs)
+            logger.debug(f"Exit search recipes : {query} : success")
+            return response
+        except Exception as e:
+            logger.error(f"Error search recipes : {e}", exc_info=True)
+            return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecipeTrendingAPIView(FastListMixin, SparseFieldsMixin, generics.ListAPIView):
+    """
+    Recipes ordered by their precomputed trending score, recent likes and
+    bookmarks weighing most (`?fields=`/`?omit=` to choose fields)
+    """
+
+    serializer_class = RecipeSerializer
+    permission_classes = (AllowAny,)
+    pagination_class = RecipeTrendingPagination
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_class = RecipeFilter
+
+    def get_queryset(self):
+        queryset = Recipe.objects.with_related().filter(trending_score__gt=0)
+        return self.trim_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        try:
+            logger.debug("Enter get trending recipes")
+            response = super().list(request, *args, **kwargs)
+            logger.debug("Exit get trending recipes: success")
+            return response
+        except Exception as e:
+            logger.error(f"Error get trending recipes: {e}", exc_info=True)
+            return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecipeCookAPIView(FastListMixin, SparseFieldsMixin, generics.ListAPIView):
+    """
+    Recipes using the given ingredients, ranked by the share of their
+    ingredients covered (`?ingredients=egg,flour,milk`, `?max_missing=` to
+    cap the ingredients still needed, `?fields=`/`?omit=` to choose fields)
+    """
+
+    serializer_class = RecipeSerializer
+    permission_classes = (AllowAny,)
+    pagination_class = RecipeCoveragePagination
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_class = RecipeFilter
+    extra_fields = ("matched_ingredients", "coverage")
+
+    def get_queryset(self):
+        queryset = Recipe.objects.with_related().with_ingredient_coverage(
+            self.ingredient_ids, max_missing=self.max_missing
+        )
+        if not self.ingredient_ids:
+            queryset = queryset.none()
+        return self.trim_queryset(queryset)
+
+    def parse_params(self):
+        """
+        Resolves the requested ingredients to ids, returns validation errors
+        if any.
+        """
+        params = self.request.query_params
+        names = parse_ingredients(params.get("ingredients", ""))
+        if not names:
+            return {"ingredients": ["This query parameter is required."]}
+        if len(names) > settings.RECIPE_COOK_MAX_INGREDIENTS:
+            return {
+                "ingredients": [
+                    f"At most {settings.RECIPE_COOK_MAX_INGREDIENTS} ingredients are allowed."
+                ]
+            }
+        self.max_missing = None
+        if "max_missing" in params:
+            value = params["max_missing"]
+            if not (value.isascii() and value.isdigit()):
+                return {"max_missing": ["A non-negative integer is required."]}
+            self.max_missing = int(value)
+        self.ingredient_ids = list(
+            Ingredient.objects.filter(name__in=names).values_list("id", flat=True)
+        )
+        return None
+
+    def list(self, request, *args, **kwargs):
+        try:
+            logger.debug("Enter cook with ingredients")
+            errors = self.parse_params()
+            if errors:
+                logger.debug("Exit cook with ingredients : invalid params")
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            response = super().list(request, *args, **kwargs)
+            logger.debug("Exit cook with ingredients : success")
+            return response
+        except Exception as e:
+            logger.error(f"Error cook with ingredients : {e}", exc_info=True)
+            return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecipeImportAPIView(APIView):
+    """
+    Bulk import recipes from a JSON array or NDJSON request body
+    (`?batch_size=` rows per insert)
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        try:
+            logger.debug(f"Enter import recipes : {request.user}")
+            batch_size = settings.RECIPE_IMPORT_BATCH_SIZE
+            if "batch_size" in request.query_params:
+                try:
+                    batch_size = int(request.query_params["batch_size"])
+                except ValueError:
+                    batch_size = 0
+                if batch_size < 1:
+                    return Response(
+                        {"batch_size": ["A positive integer is required."]},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+            importer = RecipeImporter(request.user, batch_size=batch_size)
+            # Read the body as a stream; request.data would load it whole.
+            try:
+                result = importer.run(iter_records(request.stream or io.BytesIO()))
+            except ValueError as e:
+                result = importer.get_result()
+                result["detail"] = str(e)
+                logger.debug(f"Exit import recipes : {request.user} : invalid input")
+                return Response(result, status=status.HTTP_400_BAD_REQUEST)
+            logger.debug(f"Exit import recipes : {request.user} : success")
+            return Response(result, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error import recipes : {e}", exc_info=True)
+            return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecipeExportAPIView(APIView):
+    """
+    Stream every recipe as NDJSON, optionally filtered like the recipe list
+    (`?since=<updated_at>&since_id=<id>` to resume an interrupted export)
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        try:
+            logger.debug(f"Enter export recipes : {request.user}")
+            filterset = RecipeFilter(request.query_params, queryset=Recipe.objects.all())
+            if not filterset.is_valid():
+                logger.debug("Exit export recipes : invalid filters")
+                return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+            params = request.query_params
+            try:
+                since = parse_since(params["since"]) if "since" in params else None
+                since_id = int(params["since_id"]) if "since_id" in params else None
+            except ValueError as e:
+                logger.debug("Exit export recipes : invalid resume point")
+                return Response({"since": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+            exporter = RecipeExporter(
+                filterset.qs,
+                since=since,
+                since_id=since_id,
+                chunk_size=settings.RECIPE_EXPORT_CHUNK_SIZE,
+                context={"request": request},
+            )
+            response = StreamingHttpResponse(
+                exporter.iter_lines(), content_type="application/x-ndjson"
+            )
+            response["Content-Disposition"] = 'attachment; filename="recipes.ndjson"'
+            logger.debug(f"Exit export recipes : {request.user} : streaming")
+            return response
+        except Exception as e:
+            logger.error(f"Error export recipes : {e}", exc_info=True)
+            return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecipeLikeAnalyticsAPIView(APIView):
+    """
+    Daily likes and unlikes of the requesting author's recipes
+    (`?start=`/`?end=` dates, inclusive, `?recipe=` for a single recipe)
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        try:
+            logger.debug(f"Enter like analytics : {request.user}")
+            params = RecipeLikeAnalyticsQuerySerializer(data=request.query_params)
+            if not params.is_valid():
+                logger.debug("Exit like analytics : invalid params")
+                return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+            start, end = params.validated_data["start"], params.validated_data["end"]
+            queryset = RecipeLikeDaily.objects.filter(
+                author=request.user, day__range=(start, end)
+            )
+            if "recipe" in params.validated_data:
+                queryset = queryset.filter(recipe_id=params.validated_data["recipe"])
+            results = [
+                {"recipe": recipe_id, "day": day, "likes": likes, "unlikes": unlikes}
+                for recipe_id, day, likes, unlikes in queryset.order_by(
+                    "day", "recipe_id"
+                ).values_list("recipe_id", "day", "likes", "unlikes")
+            ]
+            logger.debug(f"Exit like analytics : {request.user} : success")
+            return Response(
+                {
+                    "start": start,
+                    "end": end,
+                    "totals": {
+                        "likes": sum(row["likes"] for row in results),
+                        "unlikes": sum(row["unlikes"] for row in results),
+                    },
+                    "results": results,
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error like analytics : {e}", exc_info=True)
+            return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class RecipeLikeAPIView(generics.CreateAPIView):
     """
     Like, Dislike a recipe
@@ -103,36 +470,46 @@ class RecipeLikeAPIView(generics.CreateAPIView):
     serializer_class = RecipeLikeSerializer
     permission_classes = (IsAuthenticated,)
 
+    def get_likes(self):
+        """
+        Likes are written through the Redis buffer when it is enabled.
+        """
+        if likebuffer.is_enabled():
+            return likebuffer
+        return RecipeLike.objects
+
     def post(self, request, pk):
         try:
-            recipe = get_object_or_404(Recipe, id=self.kwargs["pk"])
-            logger.debug(f"Enter like recipe : {request.user} {recipe.id}")
-            new_like, created = RecipeLike.objects.get_or_create(
-                user=request.user, recipe=recipe
-            )
+            logger.debug(f"Enter like recipe : {request.user} {pk}")
+            exists, created = self.get_likes().like(request.user.id, pk)
+            if not exists:
+                logger.debug(f"Exit like recipe : {pk} : not found")
+                return Response(status=status.HTTP_404_NOT_FOUND)
             if created:
-                logger.debug(f"Exit like recipe : {recipe.id} : success")
-                new_like.save()
+                recipe_cache.invalidate_recipe(pk)
+                logger.debug(f"Exit like recipe : {pk} : success")
                 return Response(status=status.HTTP_201_CREATED)
-            logger.debug(f"Exit like recipe : {recipe.id} {request.user} : failure")
+            logger.debug(f"Exit like recipe : {pk} {request.user} : failure")
             return Response(status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            logger.error(f"Error like recipe : {recipe.id} : {e}", exc_info=True)
+            logger.error(f"Error like recipe : {pk} : {e}", exc_info=True)
             return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def delete(self, request, pk):
         try:
-            recipe = get_object_or_404(Recipe, id=self.kwargs["pk"])
-            logger.debug(f"Enter dislike recipe : {request.user} {recipe.id}")
-            like = RecipeLike.objects.filter(user=request.user, recipe=recipe)
-            if like.exists():
-                like.delete()
-                logger.debug(f"Exit dislike recipe : {recipe.id} : success")
+            logger.debug(f"Enter dislike recipe : {request.user} {pk}")
+            exists, removed = self.get_likes().unlike(request.user.id, pk)
+            if not exists:
+                logger.debug(f"Exit dislike recipe : {pk} : not found")
+                return Response(status=status.HTTP_404_NOT_FOUND)
+            if removed:
+                recipe_cache.invalidate_recipe(pk)
+                logger.debug(f"Exit dislike recipe : {pk} : success")
                 return Response(status=status.HTTP_200_OK)
-            logger.debug(f"Exit dislike recipe : {recipe.id} {request.user} : failure")
+            logger.debug(f"Exit dislike recipe : {pk} {request.user} : failure")
             return Response(status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            logger.error(f"Error dislike recipe : {recipe.id} : {e}", exc_info=True)
+            logger.error(f"Error dislike recipe : {pk} : {e}", exc_info=True)
             return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def perform_create(self, serializer):
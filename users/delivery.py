@@ -0,0 +1,137 @@
+"""
+Batched email delivery over pooled connections.
+
+Messages are sent over one connection of the configured EMAIL_BACKEND per
+batch of EMAIL_DELIVERY_BATCH_SIZE, instead of one SMTP (and TLS)
+handshake per message. A transient failure (dropped connection, timeout,
+4xx reply) closes the connection and retries the message on a new one with
+exponential backoff. A permanent failure (5xx reply) of one message is
+counted and the next message is sent, while failing to connect for good
+aborts the run, since every following message would fail the same way.
+"""
+import logging
+import smtplib
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+def is_transient(error):
+    """
+    Returns whether sending may succeed if `error` is retried later.
+    """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    # Socket errors and timeouts
+    return isinstance(error, OSError)
+
+
+class EmailDelivery:
+    """
+    Sends messages in batches, one connection per batch, retrying transient
+    failures up to `max_retries` times with a backoff of `backoff` seconds
+    doubled on every retry. Counts what it sent for get_stats().
+    """
+
+    def __init__(self, batch_size=None, max_retries=None, backoff=None):
+        self.batch_size = batch_size or settings.EMAIL_DELIVERY_BATCH_SIZE
+        self.max_retries = (settings.EMAIL_DELIVERY_MAX_RETRIES
+                            if max_retries is None else max_retries)
+        self.backoff = (settings.EMAIL_DELIVERY_RETRY_BACKOFF
+                        if backoff is None else backoff)
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.connections = 0
+        self.elapsed = 0.0
+
+    def send(self, messages):
+        started = time.monotonic()
+        messages = iter(messages)
+        try:
+            while True:
+                batch = list(islice(messages, self.batch_size))
+                if not batch:
+                    break
+                self.send_batch(batch)
+        finally:
+            self.elapsed += time.monotonic() - started
+            stats = self.get_stats()
+            logger.info(
+                f"Email delivery: {stats['sent']} sent, {stats['failed']} failed, "
+                f"{stats['retries']} retries over {stats['connections']} connections "
+                f"in {stats['seconds']}s ({stats['per_second']}/s)")
+        return self.get_stats()
+
+    def send_batch(self, batch):
+        connection = None
+        try:
+            for message in batch:
+                attempt = 0
+                while True:
+                    opening = True
+                    try:
+                        if connection is None:
+                            connection = self.open()
+                        opening = False
+                        self.sent += connection.send_messages([message])
+                        break
+                    except Exception as e:
+                        self.close(connection)
+                        connection = None
+                        if is_transient(e) and attempt < self.max_retries:
+                            attempt += 1
+                            self.retries += 1
+                            delay = self.backoff * 2 ** (attempt - 1)
+                            logger.warning(f'Email delivery retry {attempt} in {delay}s: {e}')
+                            time.sleep(delay)
+                            continue
+                        if opening:
+                            raise
+                        self.failed += 1
+                        logger.error(f'Email to {message.to} not delivered: {e}')
+                        break
+        finally:
+            self.close(connection)
+
+    def open(self):
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        self.connections += 1
+        return connection
+
+    @staticmethod
+    def close(connection):
+        if connection is None:
+            return
+        try:
+            connection.close()
+        except Exception as e:
+            logger.debug(f'Email connection not closed cleanly: {e}')
+
+    def get_stats(self):
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'connections': self.connections,
+            'seconds': round(self.elapsed, 3),
+            'per_second': round(self.sent / self.elapsed, 1) if self.elapsed else 0.0,
+        }
+
+
+def send_messages(messages, **kwargs):
+    """
+    Sends `messages` with a new EmailDelivery and returns its stats.
+    """
+    return EmailDelivery(**kwargs).send(messages)
@@ -0,0 +1,154 @@
+"""
+Bulk user provisioning from JSON arrays or newline-delimited JSON.
+
+Passwords are hashed in a process pool, since hashing dominates the cost
+of creating a user, and users and their profiles are inserted with
+`bulk_create`. No post_save signals are sent, so the per-user profile
+creation and re-save of users/signals.py are done once per batch instead.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from .models import CustomUser, Profile
+
+logger = logging.getLogger(__name__)
+
+
+class UserImportSerializer(serializers.ModelSerializer):
+    """
+    Validates one imported user. Uniqueness is checked per batch by
+    UserImporter, so the unique validators of the model fields are skipped.
+    A missing password leaves the user without a usable password.
+    """
+    email = serializers.EmailField(max_length=254)
+    password = serializers.CharField(required=False, allow_null=True,
+                                     trim_whitespace=False)
+
+    class Meta:
+        model = CustomUser
+        fields = ('email', 'username', 'password', 'first_name', 'last_name')
+        extra_kwargs = {
+            # The model's character rules, without its UniqueValidator
+            'username': {'validators': [CustomUser.username_validator]},
+        }
+
+
+class UserImporter:
+    """
+    Imports users in batches: rows are validated one by one, emails and
+    usernames are checked against existing users once per batch, passwords
+    are hashed by `hash_workers` processes and users and profiles are
+    inserted with `bulk_create`. Invalid rows are reported without stopping the import.
+    """
+
+    def __init__(self, batch_size=1000, hash_workers=None, max_errors=1000):
+        self.batch_size = batch_size
+        self.hash_workers = hash_workers or os.cpu_count() or 1
+        self.max_errors = max_errors
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.executor = None
+
+    def add_error(self, row, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'errors': errors})
+
+    def run(self, records):
+        # A single worker hashes in process
+        if self.hash_workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.hash_workers)
+        try:
+            batch = []
+            for row, data, error in records:
+                if error is not None:
+                    self.add_error(row, {'non_field_errors': [error]})
+                    continue
+                if not isinstance(data, dict):
+                    self.add_error(row, {'non_field_errors': ['Expected a JSON object.']})
+                    continue
+                batch.append((row, data))
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch)
+                    batch = []
+            if batch:
+                self.import_batch(batch)
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+        return self.get_result()
+
+    def hash_passwords(self, passwords):
+        if self.executor is None:
+            return [make_password(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.hash_workers * 4))
+        return list(self.executor.map(make_password, passwords, chunksize=chunksize))
+
+    def import_batch(self, batch):
+        valid = []
+        emails, usernames = set(), set()
+        for row, data in batch:
+            serializer = UserImportSerializer(data=data)
+            if not serializer.is_valid():
+                self.add_error(row, serializer.errors)
+                continue
+            data = serializer.validated_data
+            data['email'] = CustomUser.objects.normalize_email(data['email'])
+            if data['email'] in emails or data['username'] in usernames:
+                self.add_error(row, {'non_field_errors': ['Duplicate user in import.']})
+                continue
+            emails.add(data['email'])
+            usernames.add(data['username'])
+            valid.append((row, data))
+        if not valid:
+            return
+
+        taken = CustomUser.objects.filter(
+            Q(email__in=emails) | Q(username__in=usernames)
+        ).values_list('email', 'username')
+        taken_emails = {email for email, _ in taken}
+        taken_usernames = {username for _, username in taken}
+        rows = []
+        for row, data in valid:
+            if data['email'] in taken_emails:
+                self.add_error(row, {'email': ['A user with this email already exists.']})
+            elif data['username'] in taken_usernames:
+                self.add_error(row, {'username': ['A user with that username already exists.']})
+            else:
+                rows.append((row, data))
+        if not rows:
+            return
+
+        passwords = self.hash_passwords([data.get('password') for _, data in rows])
+        users = [
+            CustomUser(**{key: value for key, value in data.items() if key != 'password'},
+                       password=password)
+            for (_, data), password in zip(rows, passwords)
+        ]
+        try:
+            with transaction.atomic():
+                CustomUser.objects.bulk_create(users, batch_size=self.batch_size)
+                Profile.objects.bulk_create(
+                    [Profile(user=user) for user in users], batch_size=self.batch_size)
+        except DatabaseError as e:
+            logger.error(f'Error import users batch: {e}', exc_info=True)
+            for row, _ in rows:
+                self.add_error(row, {'non_field_errors': [str(e)]})
+            return
+        self.created += len(users)
+
+    def get_result(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+        }
+
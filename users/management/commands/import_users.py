@@ -0,0 +1,50 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importers import iter_records
+from users.importers import UserImporter
+
+
+class Command(BaseCommand):
+    help = ('Bulk create users and their profiles from a JSON array or NDJSON '
+            'file of {"email", "username", "password"} objects.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='File to import, or - to read from stdin.')
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.USER_IMPORT_BATCH_SIZE,
+            help='Number of rows validated and inserted per batch.')
+        parser.add_argument(
+            '--hash-workers', type=int, default=settings.USER_IMPORT_HASH_WORKERS,
+            help='Processes hashing passwords, 0 for one per CPU.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be a positive integer')
+        if options['hash_workers'] < 0:
+            raise CommandError('--hash-workers must not be negative')
+
+        importer = UserImporter(batch_size=options['batch_size'],
+                                hash_workers=options['hash_workers'])
+        if options['path'] == '-':
+            stream = sys.stdin.buffer
+        else:
+            stream = open(options['path'], 'rb')
+        try:
+            result = importer.run(iter_records(stream))
+        except ValueError as e:
+            raise CommandError(
+                f'{e} ({importer.created} users imported before the error)')
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        for error in result['errors']:
+            self.stderr.write(
+                f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} users, {result['failed']} failed."))
@@ -1,6 +1,9 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import connections, models
 from django.utils.translation import ugettext_lazy as _
 
+from recipe.models import Recipe
+
 
 class CustomUserManager(BaseUserManager):
     """
@@ -26,3 +29,66 @@ class CustomUserManager(BaseUserManager):
         if extra_fields.get('is_superuser') is not True:
             raise ValueError(_('Superuser must have is_superuser=True.'))
         return self.create_user(email, password, **extra_fields)
+
+
+class ProfileManager(models.Manager):
+    """
+    Bulk bookmark changes addressed by user id, in a single statement each:
+    the profile lookup, the bookmark rows and the recipes' bookmarks_count
+    change together. Unknown recipe ids are skipped.
+    """
+
+    def add_bookmarks(self, user_id, recipe_ids):
+        """
+        Returns (profile_exists, ids of the recipes newly bookmarked).
+        """
+        sql = f"""
+            WITH profile AS (
+                SELECT id FROM {self.model._meta.db_table} WHERE user_id = %(user_id)s
+            ), inserted AS (
+                INSERT INTO {self.model.bookmarks.through._meta.db_table}
+                    (profile_id, recipe_id, created_at)
+                SELECT profile.id, recipe.id, NOW()
+                FROM profile, {Recipe._meta.db_table} recipe
+                WHERE recipe.id = ANY(%(recipe_ids)s)
+                ON CONFLICT (profile_id, recipe_id) DO NOTHING
+                RETURNING recipe_id
+            ), counted AS (
+                UPDATE {Recipe._meta.db_table}
+                SET bookmarks_count = bookmarks_count + 1, updated_at = NOW()
+                WHERE id IN (SELECT recipe_id FROM inserted)
+                RETURNING id
+            )
+            SELECT EXISTS (SELECT 1 FROM profile), ARRAY(SELECT id FROM counted)
+        """
+        return self._execute(sql, user_id, recipe_ids)
+
+    def remove_bookmarks(self, user_id, recipe_ids):
+        """
+        Returns (profile_exists, ids of the recipes no longer bookmarked).
+        """
+        sql = f"""
+            WITH profile AS (
+                SELECT id FROM {self.model._meta.db_table} WHERE user_id = %(user_id)s
+            ), deleted AS (
+                DELETE FROM {self.model.bookmarks.through._meta.db_table} bookmark
+                USING profile
+                WHERE bookmark.profile_id = profile.id
+                  AND bookmark.recipe_id = ANY(%(recipe_ids)s)
+                RETURNING bookmark.recipe_id
+            ), counted AS (
+                UPDATE {Recipe._meta.db_table}
+                SET bookmarks_count = GREATEST(bookmarks_count - 1, 0),
+                    updated_at = NOW()
+                WHERE id IN (SELECT recipe_id FROM deleted)
+                RETURNING id
+            )
+            SELECT EXISTS (SELECT 1 FROM profile), ARRAY(SELECT id FROM counted)
+        """
+        return self._execute(sql, user_id, recipe_ids)
+
+    def _execute(self, sql, user_id, recipe_ids):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, {'user_id': user_id, 'recipe_ids': list(recipe_ids)})
+            exists, changed = cursor.fetchone()
+            return exists, sorted(changed)
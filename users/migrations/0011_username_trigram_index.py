@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0007_category_name_trigram_index'),
+        ('users', '0010_alter_profile_avatar'),
+    ]
+
+    # RecipeFilter.author_username uses icontains, which Postgres runs as
+    # UPPER(username::text) LIKE UPPER(%s); the indexes match that expression.
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE INDEX users_customuser_username_trgm_idx
+            ON users_customuser USING gin (UPPER(username::text) gin_trgm_ops);
+            CREATE INDEX users_customuser_username_upper_idx
+            ON users_customuser (UPPER(username::text));
+            """,
+            """
+            DROP INDEX IF EXISTS users_customuser_username_trgm_idx;
+            DROP INDEX IF EXISTS users_customuser_username_upper_idx;
+            """,
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The old table has no timestamps: give existing bookmarks the migration
+# time, one millisecond apart in their original order, so "recently saved"
+# keeps that order and cursor positions stay distinct.
+COPY_BOOKMARKS = '''
+    INSERT INTO users_bookmark (profile_id, recipe_id, created_at)
+    SELECT profile_id, recipe_id,
+           NOW() - (MAX(id) OVER () - id) * INTERVAL '1 millisecond'
+    FROM users_profile_bookmarks
+    ORDER BY id;
+'''
+
+RESTORE_BOOKMARKS = '''
+    INSERT INTO users_profile_bookmarks (profile_id, recipe_id)
+    SELECT profile_id, recipe_id FROM users_bookmark ORDER BY created_at, id;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0013_like_rollup'),
+        ('users', '0011_username_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Bookmark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookmark_links', to='users.profile')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookmark_links', to='recipe.recipe')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='bookmark',
+            constraint=models.UniqueConstraint(fields=('profile', 'recipe'), name='bookmark_profile_recipe_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='bookmark',
+            index=models.Index(fields=['profile', '-created_at', '-id'], name='bookmark_profile_created_idx'),
+        ),
+        migrations.RunSQL(COPY_BOOKMARKS, RESTORE_BOOKMARKS),
+        # Drops the auto-created table, then declares the field again through
+        # Bookmark, which needs no table of its own.
+        migrations.RemoveField(
+            model_name='profile',
+            name='bookmarks',
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='bookmarks',
+            field=models.ManyToManyField(related_name='bookmarked_by', through='users.Bookmark', to='recipe.Recipe'),
+        ),
+    ]
@@ -5,7 +5,7 @@ from django.utils.translation import ugettext_lazy as _
 
 from recipe.models import Recipe
 
-from .managers import CustomUserManager
+from .managers import CustomUserManager, ProfileManager
 
 
 class CustomUser(AbstractUser):
@@ -19,13 +19,86 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_username = instance.__dict__.get('username')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._saved_username = self.username
+
+    def username_changed(self):
+        """
+        Returns whether the username differs from its last loaded or saved
+        value.
+        """
+        return ('username' in self.__dict__
+                and getattr(self, '_saved_username', None) != self.username)
+
 
 class Profile(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    bookmarks = models.ManyToManyField(Recipe, related_name='bookmarked_by')
+    bookmarks = models.ManyToManyField(
+        Recipe, related_name='bookmarked_by', through='Bookmark')
     avatar = models.ImageField(upload_to='avatar', blank=True)
     bio = models.CharField(max_length=200, blank=True)
 
+    objects = ProfileManager()
+
+    # Fields compared by has_changed()
+    tracked_fields = ('avatar', 'bio')
+
     def __str__(self):
         return self.user.username
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_values = instance.get_tracked_values()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._saved_values = self.get_tracked_values()
+
+    def get_tracked_values(self):
+        values = {}
+        for name in self.tracked_fields:
+            if name in self.__dict__:  # skips deferred fields
+                value = getattr(self, name)
+                # Files compare by name, the FieldFile itself is mutable
+                values[name] = getattr(value, 'name', value)
+        return values
+
+    def has_changed(self):
+        """
+        Returns whether the profile differs from its last loaded or saved
+        state.
+        """
+        return (self._state.adding
+                or getattr(self, '_saved_values', None) != self.get_tracked_values())
+
+
+class Bookmark(models.Model):
+    """
+    A recipe saved by a profile, with the time it was saved
+    """
+    profile = models.ForeignKey(
+        Profile, related_name='bookmark_links', on_delete=models.CASCADE)
+    recipe = models.ForeignKey(
+        Recipe, related_name='bookmark_links', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'recipe'],
+                                    name='bookmark_profile_recipe_unique'),
+        ]
+        indexes = [
+            # Recently saved first, see UserBookmarkAPIView
+            models.Index(fields=['profile', '-created_at', '-id'],
+                         name='bookmark_profile_created_idx'),
+        ]
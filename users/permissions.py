@@ -0,0 +1,11 @@
+from rest_framework import permissions
+
+
+class IsProfileOwner(permissions.BasePermission):
+    """
+    Check if the user in the url is the authenticated user.
+    """
+
+    def has_permission(self, request, view):
+        return (request.user.is_authenticated is True
+                and view.kwargs.get('pk') == request.user.id)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 
@@ -49,6 +50,14 @@ class ProfileSerializer(CustomUserSerializer):
         model = Profile
         fields = ('bookmarks', 'bio')
 
+    def validate(self, data):
+        # Bookmarks go through a custom through model, which DRF leaves
+        # read-only; reject them instead of silently dropping the change.
+        if 'bookmarks' in self.initial_data:
+            raise serializers.ValidationError(
+                {'bookmarks': 'Use /api/user/profile/<user id>/bookmarks/ to change bookmarks'})
+        return data
+
 
 class ProfileAvatarSerializer(serializers.ModelSerializer):
     """
@@ -59,6 +68,23 @@ class ProfileAvatarSerializer(serializers.ModelSerializer):
         fields = ('avatar',)
 
 
+class BookmarkIdsSerializer(serializers.Serializer):
+    """
+    Serializer class for the recipes to bookmark or unbookmark, given as
+    a single `id` or a list of `ids`
+    """
+    id = serializers.IntegerField(required=False, min_value=1)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False,
+        allow_empty=False, max_length=settings.BOOKMARK_BULK_MAX_IDS)
+
+    def validate(self, data):
+        if 'id' not in data and 'ids' not in data:
+            raise serializers.ValidationError("Either id or ids is required")
+        ids = data.get('ids', []) + ([data['id']] if 'id' in data else [])
+        return {'ids': list(dict.fromkeys(ids))}
+
+
 class PasswordChangeSerializer(serializers.Serializer):
     """
     Serializer class for changing user password
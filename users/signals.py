@@ -1,4 +1,4 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.contrib.auth import get_user_model
 from django.dispatch import receiver
 from django.core.mail import EmailMultiAlternatives
@@ -7,6 +7,10 @@ from django.urls import reverse
 
 from django_rest_passwordreset.signals import reset_password_token_created
 
+from recipe import cache as recipe_cache
+from recipe import refcache
+
+from . import delivery
 from .models import Profile
 
 
@@ -21,7 +25,33 @@ def create_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
+    # Only a profile loaded through the user can have been changed with it
+    if not User.profile.is_cached(instance):
+        return
+    if instance.profile.has_changed():
+        instance.profile.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_username_cache(sender, instance, created=False, **kwargs):
+    refcache.usernames.invalidate(instance.id)
+    # Cached responses show the username of every recipe's author
+    if not created and instance.username_changed():
+        recipe_cache.invalidate_names()
+
+
+@receiver(m2m_changed, sender=Profile.bookmarks.through)
+def invalidate_bookmarked_recipes(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        recipe_cache.invalidate_recipe(instance.id)
+    elif pk_set:
+        for recipe_id in pk_set:
+            recipe_cache.invalidate_recipe(recipe_id)
+    else:
+        recipe_cache.invalidate_all()
 
 
 # Password reset
@@ -53,4 +83,5 @@ def password_reset_token_created(sender, instance, reset_password_token, *args,
         [reset_password_token.user.email]
     )
     msg.attach_alternative(email_html_message, "text/html")
-    msg.send()
+    # Sent within the request: no retries sleeping in a web worker
+    delivery.send_messages([msg], max_retries=0)
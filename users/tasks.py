@@ -1,56 +1,110 @@
 import logging
+from datetime import date, datetime, time, timedelta
+from itertools import groupby, islice
+from operator import itemgetter
+
 from celery import shared_task
+from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
 from django.utils import timezone
-from django.contrib.auth import get_user_model
 from django.template.loader import render_to_string
 
 from recipe.models import RecipeLike
 
-User = get_user_model()
+from . import delivery
 
 logger = logging.getLogger(__name__)
 
 
+def _likes_on(day):
+    # A range on created, unlike created__date, can use its index
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return RecipeLike.objects.filter(
+        created__gte=start, created__lt=start + timedelta(days=1))
+
+
 @shared_task
 def send_daily_likes_notification():
     """
     Send daily notifications to authors about likes received on their recipes.
+    Only the authors liked today are read, with one DISTINCT query over
+    today's likes, and their emails are sent by send_daily_likes_digest
+    subtasks in chunks.
     """
     try:
         logger.debug("Enter send_daily_likes_notification")
         today = timezone.now().date()
-        users = User.objects.all()
-        for user in users:
-            # Get the likes received by the user's recipes today
-            liked_recipes = RecipeLike.objects.filter(
-                recipe__author=user, created__date=today
-            )
-
-            if liked_recipes.exists():
-                subject = "Daily Likes Notification"
-                context = {
-                    "user": user,
-                    "liked_recipes": liked_recipes,
-                }
-                email_html_message = render_to_string(
-                    "users/daily_likes_notification.html", context
-                )
-                email_plaintext_message = render_to_string(
-                    "users/daily_likes_notification.txt", context
-                )
-                msg = EmailMultiAlternatives(
-                    # title:
-                    subject,
-                    # message:
-                    email_plaintext_message,
-                    # from:
-                    "noreply@somehost.local",
-                    # to:
-                    [user.email],
-                )
-                msg.attach_alternative(email_html_message, "text/html")
-                msg.send()
-        logger.debug("Exit send_daily_likes_notification: success")
+        author_ids = (
+            _likes_on(today)
+            .order_by("recipe__author_id")
+            .values_list("recipe__author_id", flat=True)
+            .distinct()
+            .iterator(chunk_size=settings.DAILY_LIKES_DIGEST_CHUNK_SIZE)
+        )
+        chunks = 0
+        while True:
+            chunk = list(islice(author_ids, settings.DAILY_LIKES_DIGEST_CHUNK_SIZE))
+            if not chunk:
+                break
+            send_daily_likes_digest.delay(chunk, today.isoformat())
+            chunks += 1
+        logger.debug(f"Exit send_daily_likes_notification: {chunks} chunks: success")
     except Exception as e:
         logger.error(f"Error send_daily_likes_notification: {e}", exc_info=True)
+
+
+@shared_task
+def send_daily_likes_digest(author_ids, day):
+    """
+    Send the daily likes notification of one chunk of authors, reading all
+    of their likes of `day` in one query.
+    """
+    try:
+        logger.debug(f"Enter send_daily_likes_digest: {len(author_ids)} authors")
+        likes = (
+            _likes_on(date.fromisoformat(day))
+            .filter(recipe__author_id__in=author_ids)
+            .order_by("recipe__author_id", "id")
+            .values_list(
+                "recipe__author_id",
+                "recipe__author__username",
+                "recipe__author__email",
+                "recipe__title",
+                "user__username",
+            )
+        )
+        messages = []
+        for (_, username, email), rows in groupby(likes, key=itemgetter(0, 1, 2)):
+            context = {
+                "user": {"username": username},
+                "liked_recipes": [
+                    {"recipe": {"title": title}, "user": {"username": liker}}
+                    for *_, title, liker in rows
+                ],
+            }
+            messages.append(_build_message(email, context))
+        stats = delivery.send_messages(messages)
+        logger.debug(f"Exit send_daily_likes_digest: {stats['sent']} of {len(messages)} emails: success")
+    except Exception as e:
+        logger.error(f"Error send_daily_likes_digest: {e}", exc_info=True)
+
+
+def _build_message(email, context):
+    email_html_message = render_to_string(
+        "users/daily_likes_notification.html", context
+    )
+    email_plaintext_message = render_to_string(
+        "users/daily_likes_notification.txt", context
+    )
+    msg = EmailMultiAlternatives(
+        # title:
+        "Daily Likes Notification",
+        # message:
+        email_plaintext_message,
+        # from:
+        "noreply@somehost.local",
+        # to:
+        [email],
+    )
+    msg.attach_alternative(email_html_message, "text/html")
+    return msg
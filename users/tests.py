@@ -1,14 +1,39 @@
+import json
+import smtplib
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from recipe.models import Recipe, RecipeCategory
+from recipe import refcache
+from recipe.models import Recipe, RecipeCategory, RecipeLike
+from . import delivery, tasks
 from .models import Profile
 
 User = get_user_model()
 
+# Tests never touch the Redis of REDIS_URL, which is shared with a running
+# server and the Celery broker
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
 class UserRegistrationTests(APITestCase):
     
     def test_user_registration_success(self):
@@ -44,6 +69,7 @@ class UserRegistrationTests(APITestCase):
         
         
         
+@override_settings(CACHES=LOCMEM_CACHES)
 class UserLoginTests(APITestCase):
 
     def setUp(self):
@@ -75,6 +101,7 @@ class UserLoginTests(APITestCase):
 
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class UserLogoutTests(APITestCase):
 
     def setUp(self):
@@ -97,6 +124,7 @@ class UserLogoutTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class UserInformationTests(APITestCase):
 
     def setUp(self):
@@ -125,6 +153,7 @@ class UserInformationTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class UserProfileTests(APITestCase):
 
     def setUp(self):
@@ -146,7 +175,26 @@ class UserProfileTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['bio'], 'Updated bio')
 
+    def test_update_user_profile_rejects_bookmarks(self):
+        recipe = Recipe.objects.create(
+            author=self.user,
+            category=RecipeCategory.objects.create(name="Soups"),
+            title="Soup",
+            desc="Warm soup",
+            cook_time="00:10:00",
+            ingredients="Water",
+            procedure="Boil",
+        )
+        data = {'bio': 'Updated bio', 'bookmarks': [recipe.id]}
+        response = self.client.put(reverse('users:user-profile'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('bookmarks', response.data)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.bio, '')
+        self.assertFalse(self.profile.bookmarks.exists())
+
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class UserBookmarkTests(APITestCase):
 
     def setUp(self):
@@ -179,7 +227,97 @@ class UserBookmarkTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertNotIn(self.recipe, self.profile.bookmarks.all())
 
-
+    def create_recipes(self, count):
+        return [
+            Recipe.objects.create(
+                author=self.user,
+                category=self.category,
+                title=f"Recipe {i}",
+                desc="Delicious recipe",
+                cook_time="01:00:00",
+                ingredients="Flour, Sugar",
+                procedure="Mix ingredients and bake",
+            )
+            for i in range(count)
+        ]
+
+    def test_bulk_add_and_remove_single_statement(self):
+        recipes = self.create_recipes(3)
+        ids = [recipe.id for recipe in recipes]
+        url = reverse('users:user-bookmark', kwargs={'pk': self.user.id})
+        with self.assertNumQueries(1):
+            response = self.client.post(url, {'ids': ids + [ids[0]]}, format='json')
+        self.assertEqual(response.data, {'added': ids})
+        response = self.client.post(url, {'ids': ids}, format='json')
+        self.assertEqual(response.data, {'added': []})
+        self.assertEqual(
+            list(Recipe.objects.filter(id__in=ids).values_list('bookmarks_count', flat=True)),
+            [1, 1, 1])
+
+        with self.assertNumQueries(1):
+            response = self.client.delete(url, {'ids': ids[:2]}, format='json')
+        self.assertEqual(response.data, {'removed': ids[:2]})
+        self.assertEqual(list(self.profile.bookmarks.all()), [recipes[2]])
+        self.assertEqual(Recipe.objects.get(id=ids[0]).bookmarks_count, 0)
+
+    def test_unknown_recipes_are_skipped(self):
+        url = reverse('users:user-bookmark', kwargs={'pk': self.user.id})
+        response = self.client.post(
+            url, {'ids': [self.recipe.id, self.recipe.id + 1000]}, format='json')
+        self.assertEqual(response.data, {'added': [self.recipe.id]})
+
+    def test_invalid_payloads(self):
+        url = reverse('users:user-bookmark', kwargs={'pk': self.user.id})
+        for payload in ({}, {'ids': []}, {'ids': ['x']}, {'id': 0}):
+            response = self.client.post(url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_missing_profile(self):
+        self.profile.delete()
+        url = reverse('users:user-bookmark', kwargs={'pk': self.user.id})
+        response = self.client.post(url, {'id': self.recipe.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_users_bookmarks_forbidden(self):
+        other = User.objects.create_user(
+            username='otheruser',
+            email='otheruser@example.com',
+            password='strongpassword123'
+        )
+        other_profile, _ = Profile.objects.get_or_create(user=other)
+        Profile.objects.add_bookmarks(other.id, [self.recipe.id])
+        url = reverse('users:user-bookmark', kwargs={'pk': other.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.delete(url, {'id': self.recipe.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(url, {'id': self.recipe.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(list(other_profile.bookmarks.all()), [self.recipe])
+        self.assertFalse(self.profile.bookmarks.exists())
+
+    def test_list_bookmarks_recently_saved_first(self):
+        recipes = [self.recipe] + self.create_recipes(11)
+        saved = list(reversed(recipes[::2])) + list(reversed(recipes[1::2]))
+        for recipe in reversed(saved):
+            Profile.objects.add_bookmarks(self.user.id, [recipe.id])
+        url = reverse('users:user-bookmark', kwargs={'pk': self.user.id})
+        refcache.category_names.get(self.category.id)
+        refcache.usernames.get(self.user.id)
+        # One SELECT per page, no COUNT
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        results = response.data['results']
+        self.assertEqual(len(results), 10)
+        self.assertTrue(results[0]['is_bookmarked'])
+        self.assertIn('saved_at', results[0])
+        response = self.client.get(response.data['next'] + '&fields=id,title')
+        results += response.data['results']
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'saved_at'})
+        self.assertEqual([item['id'] for item in results], [r.id for r in saved])
+
+@override_settings(CACHES=LOCMEM_CACHES)
 class PasswordChangeTests(APITestCase):
 
     def setUp(self):
@@ -208,3 +346,247 @@ class PasswordChangeTests(APITestCase):
         response = self.client.patch(reverse('users:change-password'), data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('old_password', response.data)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UserImportTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='strongpassword123'
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def build_rows(self, count, start=0):
+        return [
+            {'email': f'user{i}@Example.com', 'username': f'user{i}',
+             'password': f'password{i}'}
+            for i in range(start, start + count)
+        ]
+
+    def post_import(self, rows, **params):
+        url = reverse('users:import-users')
+        if params:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        body = '\n'.join(
+            row if isinstance(row, str) else json.dumps(row) for row in rows)
+        return self.client.post(url, data=body, content_type='application/x-ndjson')
+
+    def test_import_creates_users_and_profiles(self):
+        rows = self.build_rows(2) + [
+            {'email': 'nopassword@example.com', 'username': 'nopassword'},
+            {'email': 'user0@example.com', 'username': 'again'},
+            {'email': 'admin@example.com', 'username': 'other'},
+            {'email': 'notanemail', 'username': 'bad'},
+            '{not json',
+            {'email': 'badname@example.com', 'username': 'bad name/!'},
+        ]
+        response = self.post_import(rows)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4, 5, 6, 7, 8])
+        self.assertIn('username', response.data['errors'][-1]['errors'])
+        user = User.objects.get(username='user1')
+        self.assertEqual(user.email, 'user1@example.com')
+        self.assertTrue(user.check_password('password1'))
+        self.assertFalse(User.objects.get(username='nopassword').has_usable_password())
+        self.assertEqual(Profile.objects.filter(user__username__startswith='user').count(), 2)
+
+    def test_import_queries_do_not_grow_with_rows(self):
+        with CaptureQueriesContext(connection) as small:
+            self.post_import(self.build_rows(3))
+        with CaptureQueriesContext(connection) as large:
+            self.post_import(self.build_rows(30, start=3))
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(User.objects.count(), 34)
+
+    def test_import_requires_admin(self):
+        user = User.objects.create_user(
+            username='testuser', email='testuser@example.com', password='x')
+        self.client.force_authenticate(user=user)
+        response = self.post_import(self.build_rows(1))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_rejects_invalid_batch_size(self):
+        for value in ('0', 'abc', '²'):
+            response = self.post_import(self.build_rows(1), batch_size=value)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(User.objects.filter(username='user0').exists())
+
+    @override_settings(USER_IMPORT_HASH_WORKERS=4)
+    def test_import_api_hashes_in_process(self):
+        with mock.patch('users.importers.ProcessPoolExecutor') as executor:
+            response = self.post_import(self.build_rows(2))
+        self.assertEqual(response.data['created'], 2)
+        executor.assert_not_called()
+
+    def test_import_command_hashes_in_process_pool(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as file:
+            file.write('\n'.join(json.dumps(row) for row in self.build_rows(5)))
+            file.flush()
+            out = StringIO()
+            call_command('import_users', file.name, '--hash-workers', '2',
+                         '--batch-size', '2', stdout=out)
+        self.assertIn('Imported 5 users, 0 failed.', out.getvalue())
+        self.assertTrue(User.objects.get(username='user4').check_password('password4'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SaveProfileSignalTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='testuser@example.com',
+            password='strongpassword123'
+        )
+
+    def test_user_save_skips_unchanged_profile(self):
+        user = User.objects.get(id=self.user.id)
+        with self.assertNumQueries(1):
+            user.save()
+        user.profile
+        with self.assertNumQueries(1):
+            user.save()
+
+    def test_user_save_writes_changed_profile(self):
+        user = User.objects.get(id=self.user.id)
+        user.profile.bio = 'Home cook'
+        user.save()
+        self.assertEqual(Profile.objects.get(user=self.user).bio, 'Home cook')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DailyLikesNotificationTests(APITestCase):
+
+    def setUp(self):
+        self.fan = User.objects.create_user(
+            username='fan', email='fan@example.com', password='x')
+        self.authors = [
+            User.objects.create_user(
+                username=f'author{i}', email=f'author{i}@example.com', password='x')
+            for i in range(3)
+        ]
+        category = RecipeCategory.objects.create(name='Desserts')
+        recipes = [
+            Recipe.objects.create(
+                author=author,
+                category=category,
+                title=title,
+                desc='Delicious',
+                cook_time='01:00:00',
+                ingredients='Flour, Sugar',
+                procedure='Mix and bake',
+            )
+            for author, title in (
+                (self.authors[0], 'Brownies'),
+                (self.authors[0], 'Cheesecake'),
+                (self.authors[1], 'Pavlova'),
+                (self.authors[2], 'Tiramisu'),
+            )
+        ]
+        for recipe in recipes:
+            RecipeLike.objects.like(self.fan.id, recipe.id)
+        RecipeLike.objects.filter(recipe=recipes[3]).update(
+            created=timezone.now() - timedelta(days=1))
+
+    @override_settings(DAILY_LIKES_DIGEST_CHUNK_SIZE=1)
+    def test_one_email_per_author_liked_today(self):
+        with mock.patch.object(
+            tasks.send_daily_likes_digest, 'delay',
+            side_effect=tasks.send_daily_likes_digest,
+        ) as delay:
+            # One DISTINCT query, then one query per chunk of authors
+            with self.assertNumQueries(3):
+                tasks.send_daily_likes_notification()
+        self.assertEqual(delay.call_count, 2)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['author0@example.com', 'author1@example.com'])
+        body = next(m.body for m in mail.outbox if m.to == ['author0@example.com'])
+        self.assertIn('Hello author0', body)
+        self.assertIn('Brownies - liked by fan', body)
+        self.assertIn('Cheesecake - liked by fan', body)
+        self.assertNotIn('Tiramisu', ''.join(m.body for m in mail.outbox))
+
+    def test_digest_chunk_sends_with_one_query(self):
+        author_ids = [author.id for author in self.authors]
+        with self.assertNumQueries(1):
+            tasks.send_daily_likes_digest(author_ids, timezone.now().date().isoformat())
+        self.assertEqual(len(mail.outbox), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@mock.patch.object(delivery.time, 'sleep')
+class EmailDeliveryTests(APITestCase):
+
+    def setUp(self):
+        self.messages = [
+            EmailMessage('Hello', 'Body', 'noreply@somehost.local', [f'user{i}@example.com'])
+            for i in range(5)
+        ]
+
+    def fail_calls(self, errors):
+        # Raises the given errors on the first sends, then sends to the outbox
+        send_messages = locmem.EmailBackend.send_messages
+        errors = iter(errors)
+
+        def flaky(backend, messages):
+            error = next(errors, None)
+            if error is not None:
+                raise error
+            return send_messages(backend, messages)
+        return mock.patch.object(locmem.EmailBackend, 'send_messages', flaky)
+
+    def test_one_connection_per_batch(self, sleep):
+        stats = delivery.send_messages(self.messages, batch_size=2)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(stats['sent'], 5)
+        self.assertEqual(stats['connections'], 3)
+        self.assertEqual(stats['retries'], 0)
+        sleep.assert_not_called()
+
+    def test_transient_failure_retried_with_backoff(self, sleep):
+        with self.fail_calls([smtplib.SMTPServerDisconnected('gone'),
+                              smtplib.SMTPResponseException(421, b'busy')]):
+            stats = delivery.send_messages(self.messages, batch_size=5, backoff=1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual((stats['sent'], stats['failed'], stats['retries']), (5, 0, 2))
+        # A new connection for every retry
+        self.assertEqual(stats['connections'], 3)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [1, 2])
+
+    def test_permanent_failure_skips_message(self, sleep):
+        refused = smtplib.SMTPRecipientsRefused({'user0@example.com': (550, b'unknown')})
+        with self.fail_calls([refused]):
+            stats = delivery.send_messages(self.messages)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         [f'user{i}@example.com' for i in range(1, 5)])
+        self.assertEqual((stats['sent'], stats['failed'], stats['retries']), (4, 1, 0))
+        sleep.assert_not_called()
+
+    def test_retries_exhausted_counts_failure(self, sleep):
+        with self.fail_calls([TimeoutError()] * 3):
+            stats = delivery.send_messages(self.messages[:2], max_retries=2)
+        self.assertEqual((stats['sent'], stats['failed'], stats['retries']), (1, 1, 2))
+
+    def test_password_reset_email_is_not_retried(self, sleep):
+        User.objects.create_user(
+            username='testuser', email='testuser@example.com', password='x')
+        with self.fail_calls([smtplib.SMTPServerDisconnected('gone')]):
+            response = self.client.post(
+                reverse('password_reset:reset-password-request'),
+                {'email': 'testuser@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(mail.outbox, [])
+        sleep.assert_not_called()
+
+    def test_connection_refused_aborts(self, sleep):
+        error = smtplib.SMTPAuthenticationError(535, b'bad credentials')
+        with mock.patch.object(locmem.EmailBackend, 'open', side_effect=error):
+            with self.assertRaises(smtplib.SMTPAuthenticationError):
+                delivery.send_messages(self.messages)
+        self.assertEqual(mail.outbox, [])
+        sleep.assert_not_called()
@@ -9,6 +9,7 @@ urlpatterns = [
     path('register/', views.UserRegisterationAPIView.as_view(),
          name="create-user"),
     path('login/', views.UserLoginAPIView.as_view(), name="login-user"),
+    path('import/', views.UserImportAPIView.as_view(), name='import-users'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     path('logout/', views.UserLogoutAPIView.as_view(), name='logout-user'),
     path('', views.UserAPIView.as_view(), name='user-info'),
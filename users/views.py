@@ -1,15 +1,24 @@
+import io
+
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.generics import GenericAPIView, ListCreateAPIView, RetrieveUpdateAPIView, UpdateAPIView
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.db.models import F
 
+from recipe import cache as recipe_cache
+from recipe.importers import iter_records
+from recipe.mixins import FastListMixin, SparseFieldsMixin
 from recipe.models import Recipe
+from recipe.pagination import RecipeSavedPagination
 from .models import Profile
+from .permissions import IsProfileOwner
 from recipe.serializers import RecipeSerializer
 from . import serializers
+from .importers import UserImporter
 
 
 User = get_user_model()
@@ -35,6 +44,37 @@ class UserRegisterationAPIView(GenericAPIView):
         return Response(data, status=status.HTTP_201_CREATED)
 
 
+class UserImportAPIView(GenericAPIView):
+    """
+    An endpoint for admins to bulk create users and their profiles from a
+    JSON array or NDJSON request body (`?batch_size=` rows per insert).
+    """
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request, *args, **kwargs):
+        batch_size = settings.USER_IMPORT_BATCH_SIZE
+        if 'batch_size' in request.query_params:
+            try:
+                batch_size = int(request.query_params['batch_size'])
+            except ValueError:
+                batch_size = 0
+            if batch_size < 1:
+                return Response(
+                    {'batch_size': ['A positive integer is required.']},
+                    status=status.HTTP_400_BAD_REQUEST)
+        # No process pool forked from a web worker: passwords are hashed
+        # in-process, use the import_users command for large imports
+        importer = UserImporter(batch_size=batch_size, hash_workers=1)
+        # Read the body as a stream; request.data would load it whole.
+        try:
+            result = importer.run(iter_records(request.stream or io.BytesIO()))
+        except ValueError as e:
+            result = importer.get_result()
+            result['detail'] = str(e)
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+
 class UserLoginAPIView(GenericAPIView):
     """
     An endpoint to authenticate existing users using their email and password.
@@ -107,36 +147,45 @@ class UserAvatarAPIView(RetrieveUpdateAPIView):
         return self.request.user.profile
 
 
-class UserBookmarkAPIView(ListCreateAPIView):
+class UserBookmarkAPIView(FastListMixin, SparseFieldsMixin, ListCreateAPIView):
     """
-    Get, Create, Delete favorite recipe
+    Get favorite recipes, most recently saved first (cursor paginated),
+    Create, Delete favorite recipes; create and delete accept one recipe
+    `id` or a list of `ids`
     """
     serializer_class = RecipeSerializer
-    permission_classes = (IsAuthenticated,)
-    profile = Profile.objects.all()
+    permission_classes = (IsAuthenticated, IsProfileOwner)
+    pagination_class = RecipeSavedPagination
+    extra_fields = ('saved_at',)
 
     def get_queryset(self):
-        user = User.objects.get(id=self.kwargs['pk'])
-        user_profile = get_object_or_404(self.profile, user=user)
-        return user_profile.bookmarks.all()
+        # Joins the bookmarks table to the profile of the user, no lookup
+        # of the user or profile first
+        queryset = (
+            Recipe.objects.with_related()
+            .filter(bookmark_links__profile__user_id=self.kwargs['pk'])
+            .annotate(saved_at=F('bookmark_links__created_at'),
+                      bookmark_id=F('bookmark_links__id'))
+        )
+        return self.trim_queryset(queryset)
 
     def post(self, request, pk):
-        user = User.objects.get(id=pk)
-        user_profile = get_object_or_404(self.profile, user=user)
-        recipe = Recipe.objects.get(id=request.data['id'])
-        if user_profile:
-            user_profile.bookmarks.add(recipe)
-            return Response(status=status.HTTP_200_OK)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        return self.change_bookmarks(
+            request, pk, Profile.objects.add_bookmarks, 'added')
 
     def delete(self, request, pk):
-        user = User.objects.get(id=pk)
-        user_profile = get_object_or_404(self.profile, user=user)
-        recipe = Recipe.objects.get(id=request.data['id'])
-        if user_profile:
-            user_profile.bookmarks.remove(recipe)
-            return Response(status=status.HTTP_200_OK)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        return self.change_bookmarks(
+            request, pk, Profile.objects.remove_bookmarks, 'removed')
+
+    def change_bookmarks(self, request, pk, change, result):
+        serializer = serializers.BookmarkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        exists, changed = change(pk, serializer.validated_data['ids'])
+        if not exists:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        if changed:
+            recipe_cache.invalidate_recipes(changed)
+        return Response({result: changed}, status=status.HTTP_200_OK)
 
 
 class PasswordChangeAPIView(UpdateAPIView):